@@ -0,0 +1,151 @@
+import hashlib
+import mmap
+import os
+import shutil
+import time
+from loguru import logger
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from adapters.sqlite_engine import create_sqlite_engine
+
+metadata = MetaData()
+
+revisions_table = Table(
+    "revisions",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("language", String, primary_key=True),
+    Column("sha256", String, primary_key=True),
+    Column("status", String, nullable=False),
+    Column("url", String),
+    Column("size", Integer),
+    Column("first_seen", Float),
+    Column("last_seen", Float),
+)
+
+
+# Stockage adressé par contenu : chaque PDF est stocké une seule fois sous objects/<sha[:2]>/<sha>.pdf
+# (même document pour plusieurs médicaments ou langues = un seul fichier). Les dossiers ema_*_rcp ne
+# contiennent que des vues (liens physiques, sinon symboliques) vers ces objets ; l'historique des
+# versions de chaque médicament est conservé dans blob_store.db
+class BlobStore:
+
+    def __init__(self, root: str = "blob_store", db_path: str | None = None):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.engine = create_sqlite_engine(db_path or os.path.join(root, "blob_store.db"))
+        metadata.create_all(self.engine)
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}.pdf")
+
+    def has_blob(self, sha256: str) -> bool:
+        return os.path.exists(self.blob_path(sha256))
+
+    # L'objet a-t-il encore le contenu de son nom (taille puis SHA-256) ? Un objet endommagé est partagé par
+    # toutes ses vues : il doit être remplacé, sinon chaque nouveau téléchargement y serait relié
+    def blob_matches(self, sha256: str, size: int) -> bool:
+        blob_path = self.blob_path(sha256)
+        try:
+            if os.path.getsize(blob_path) != size:
+                return False
+            if size == 0:
+                return sha256 == hashlib.sha256(b"").hexdigest()
+            with open(blob_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest() == sha256
+        except OSError:
+            return False
+
+    # Remplace atomiquement view_path par un lien vers l'objet (aucune copie de données)
+    def link_view(self, sha256: str, view_path: str) -> None:
+        blob_path = self.blob_path(sha256)
+        tmp_path = f"{view_path}.link"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(blob_path, tmp_path)
+        except OSError:
+            # Système de fichiers sans liens physiques (ou autre volume) : lien symbolique
+            os.symlink(os.path.abspath(blob_path), tmp_path)
+        os.replace(tmp_path, view_path)
+
+    # Range dans le store un fichier fraîchement téléchargé en file_path (contenu de hash sha256) :
+    # nouvel objet = lien physique vers le fichier ; objet déjà connu = la vue pointe vers l'objet existant,
+    # sauf s'il est endommagé : il est alors remplacé par le fichier téléchargé
+    def add(
+            self,
+            file_path: str,
+            sha256: str,
+            name: str,
+            language: str,
+            status: str,
+            url: str | None = None,
+            size: int | None = None
+    ) -> None:
+        blob_path = self.blob_path(sha256)
+        if os.path.exists(blob_path) and not os.path.samefile(blob_path, file_path):
+            if self.blob_matches(sha256, os.path.getsize(file_path)):
+                self.link_view(sha256, file_path)
+            else:
+                logger.warning(f"Blob {blob_path} damaged, replaced by the new download of {name}.")
+                os.remove(blob_path)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(file_path, blob_path)
+            except OSError:
+                # Store sur un autre volume (ou sans liens physiques) : copie dans le store puis vue en lien
+                tmp_path = f"{blob_path}.tmp"
+                shutil.copy2(file_path, tmp_path)
+                os.replace(tmp_path, blob_path)
+                self.link_view(sha256, file_path)
+        self.record(name, language, sha256, status, url, size)
+
+    # Nouvelle entrée d'historique (ou date de dernière observation mise à jour)
+    def record(
+            self,
+            name: str,
+            language: str,
+            sha256: str,
+            status: str,
+            url: str | None = None,
+            size: int | None = None
+    ) -> None:
+        now = time.time()
+        stmt = sqlite_insert(revisions_table).values(
+            name=name, language=language, sha256=sha256, status=status,
+            url=url, size=size, first_seen=now, last_seen=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name", "language", "sha256"],
+            set_={"status": stmt.excluded.status, "last_seen": stmt.excluded.last_seen})
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    # Versions successives d'un médicament (plus ancienne en premier)
+    def history(self, name: str, language: str = "en") -> list[dict]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(revisions_table)
+                .where(revisions_table.c.name == name, revisions_table.c.language == language)
+                .order_by(revisions_table.c.first_seen))
+            return [dict(row._mapping) for row in rows]
+
+    # Changement de statut : la vue est déplacée d'un dossier à l'autre (renommage d'un lien, pas de copie)
+    def move_view(self, src_path: str, dst_path: str, name: str, language: str, status: str) -> str | None:
+        sha256 = None
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(revisions_table.c.sha256)
+                .where(revisions_table.c.name == name, revisions_table.c.language == language)
+                .order_by(revisions_table.c.last_seen.desc())).first()
+        if row is not None and self.has_blob(row.sha256):
+            sha256 = row.sha256
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        os.replace(src_path, dst_path)
+        if sha256 is not None:
+            self.record(name, language, sha256, status)
+        logger.info(f"{name}: view moved from {src_path} to {dst_path}.")
+        return sha256
+
+    def close(self) -> None:
+        self.engine.dispose()
@@ -1,11 +1,29 @@
-import requests
 import pandas as pd
 from loguru import logger
-import time
 import asyncio
 import aiohttp
 import os
-import random
+import importlib.util
+import time
+from typing import AbstractSet
+from adapters.manifest import Manifest
+from adapters.failure_registry import FailureRegistry, FAILED
+from adapters.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from adapters.http_session import use_session
+from adapters.inventory import Inventory
+from adapters.storage import stream_to_file
+from adapters.run_journal import RunJournal, QUEUED, IN_FLIGHT
+from adapters.metrics import run_metrics
+from adapters.slug_resolver import SlugResolver, default_slug
+from adapters.blob_store import BlobStore
+from core.paths import DEFAULT_LANGUAGE, language_path
+
+# Adresse du site de l'EMA (surchargeable, ex. serveur local de benchmark)
+EMA_BASE_URL = os.environ.get("EMA_BASE_URL", "https://www.ema.europa.eu")
+# Index des médicaments (Medicine Data Table), commun à toutes les langues
+url_index_file: str = (
+    f"{EMA_BASE_URL}/en/documents/report/medicines-output-medicines-report_en.xlsx"  # noqa:E501
+)
 
 SPECIAL_CASES_AUTHORISED = {
     "Arikayce-liposomal": "arikayce-liposomal-product-information",   
@@ -17,31 +35,118 @@ SPECIAL_CASES_WITHDRAWN = {
     "Lamivudine-zidovudine-teva": "lamivudinezidovudine-teva-epar-product-information",
 }
 
+# Attente (secondes) avant de réessayer un document après un statut inattendu (hors 429 / 5xx) : doublée à
+# chaque tentative
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+
+def pdf_url(url_path: str, language: str) -> str:
+    return f"{EMA_BASE_URL}/{language}/documents/product-information/{url_path}_{language}.pdf"
+
+
+# Premier octet d'une réponse 206 (en-tête "Content-Range: bytes 100-999/1000")
+def content_range_start(resp: aiohttp.ClientResponse) -> int | None:
+    content_range = resp.headers.get("Content-Range", "")
+    if not content_range.startswith("bytes "):
+        return None
+    start = content_range[len("bytes "):].split("-", 1)[0]
+    return int(start) if start.isdigit() else None
+
+
+# Colonnes de l'index réellement utilisées par le pipeline
+INDEX_COLUMNS = ["Category", "Name of medicine", "Revision number", "Medicine status"]
+# Moteur de lecture xlsx : calamine (bien plus rapide) s'il est installé, sinon openpyxl
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+
+
+def parse_index(index_file_path: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    df: pd.DataFrame = pd.read_excel(index_file_path, skiprows=8, usecols=INDEX_COLUMNS, engine=EXCEL_ENGINE)
+    df_human: pd.DataFrame = df[df["Category"] == "Human"]
+    df_authorised: pd.DataFrame = df_human[df_human["Medicine status"] == "Authorised"]
+    df_withdrawn: pd.DataFrame = df_human[df_human["Medicine status"].isin(["Withdrawn", "Withdrawn from rolling review"])]
+    return df_authorised, df_withdrawn
 
+
+def _index_cache_paths(cache_dir: str) -> tuple[str, str]:
+    return f"{cache_dir}/authorised.parquet", f"{cache_dir}/withdrawn.parquet"
+
+
+# Renvoie (df_authorised, df_withdrawn, index_changed). Si l'index est inchangé (304 ou même hash),
+# les DataFrames filtrés sont relus depuis le cache Parquet au lieu de re-parser le fichier Excel
 async def download_index(
     url_index_file: str,
     index_file_path: str,
-) -> pd.DataFrame:
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"}  # noqa: E501
+    limiter: AdaptiveRateLimiter | None = None,
+    session: aiohttp.ClientSession | None = None,
+    manifest: Manifest | None = None,
+    cache_dir: str = "index_cache"
+) -> tuple[pd.DataFrame, pd.DataFrame, bool]:
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(initial_concurrency=1)
+    authorised_cache, withdrawn_cache = _index_cache_paths(cache_dir)
+    cache_ok = os.path.exists(authorised_cache) and os.path.exists(withdrawn_cache)
+    previous = manifest.get(index_file_path) if manifest is not None else None
+
+    headers: dict[str, str] = {}
+    if manifest is not None and cache_ok and os.path.exists(index_file_path):
+        headers = manifest.conditional_headers(index_file_path)
+    index_entry: tuple | None = None  # (ETag, Last-Modified, taille, hash) de l'index reçu (réponse 200)
+
+    def record_index() -> None:
+        if manifest is None or index_entry is None:
+            return
+        etag, last_modified, size, sha256 = index_entry
+        manifest.record(
+            index_file_path,
+            url_index_file,
+            etag=etag,
+            last_modified=last_modified,
+            content_length=size,
+            sha256=sha256)
+        manifest.save()
+
     try:
-        response: requests.Response = requests.get(url_index_file, headers=headers)
-        while response.status_code == 429:
-            logger.info("Error 429 : Too many requests. Retrying in 10 seconds...")
-            time.sleep(10)
-            response = requests.get(url_index_file, headers=headers)
-
-        if response.status_code == 200:
-            with open(index_file_path, "wb") as f:
-                f.write(response.content)
-                logger.success(f"Download successful from {url_index_file}")
-                df: pd.DataFrame = pd.read_excel(index_file_path, skiprows=8)
-                df_human: pd.DataFrame = df[df["Category"] == "Human"]
-                df_authorised: pd.DataFrame = df_human[df_human["Medicine status"] == "Authorised"]
-                df_withdrawn: pd.DataFrame = df_human[df_human["Medicine status"].isin(["Withdrawn", "Withdrawn from rolling review"])]
-                return df_authorised, df_withdrawn
-        else:
-            logger.error(f"Download failed - status {response.status_code} for {url_index_file}")
-            raise RuntimeError
+        async with use_session(session) as session:
+            while True:
+                async with limiter:
+                    async with session.get(url_index_file, headers=headers) as resp:
+                        run_metrics.inc("requests_total", status=resp.status)
+                        if resp.status == 429:
+                            logger.info("Error 429 : Too many requests. Waiting for the rate limiter before retrying...")
+                            limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                            continue
+                        if resp.status == 304:
+                            limiter.on_success()
+                            index_changed = False
+                            break
+                        if resp.status != 200:
+                            logger.error(f"Download failed - status {resp.status} for {url_index_file}")
+                            raise RuntimeError
+                        size, sha256 = await stream_to_file(resp, index_file_path)
+                        run_metrics.inc("bytes_downloaded_total", size)
+                        limiter.on_success()
+                        index_changed = not (cache_ok and previous is not None and previous["sha256"] == sha256)
+                        index_entry = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), size, sha256)
+                        break
+
+        if not index_changed:
+            logger.info(f"Index {url_index_file} unchanged since the last run, loading the cached DataFrames.")
+            df_authorised = await asyncio.to_thread(pd.read_parquet, authorised_cache)
+            df_withdrawn = await asyncio.to_thread(pd.read_parquet, withdrawn_cache)
+            record_index()
+            return df_authorised, df_withdrawn, False
+
+        logger.success(f"Download successful from {url_index_file}")
+        # Lecture du fichier Excel hors de la boucle d'événements
+        df_authorised, df_withdrawn = await asyncio.to_thread(parse_index, index_file_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        df_authorised.to_parquet(authorised_cache)
+        df_withdrawn.to_parquet(withdrawn_cache)
+        # Le nouvel index n'est enregistré qu'une fois le cache Parquet réécrit : un run interrompu (ou un index
+        # illisible) ne laisse pas un manifest qui ferait passer l'ancien cache pour à jour
+        record_index()
+        return df_authorised, df_withdrawn, True
     except Exception as exc:
         logger.exception(f"Error: {exc}")
         raise RuntimeError
@@ -54,9 +159,15 @@ async def download_pdf(
         total_count: int,
         dl_path: str,
         session: aiohttp.ClientSession,
-        sem: asyncio.Semaphore,
-        failed_urls_file: str,
-        status: str # "authorised" or "withdrawn"
+        limiter: AdaptiveRateLimiter,
+        registry: FailureRegistry,
+        status: str, # "authorised" or "withdrawn"
+        manifest: Manifest | None = None,
+        revalidate: bool = False,
+        inventory: Inventory | None = None,
+        journal: RunJournal | None = None,
+        resolver: SlugResolver | None = None,
+        store: BlobStore | None = None
 ) -> None:
     nb_retries = 5
     drug_name = row.Name
@@ -67,103 +178,208 @@ async def download_pdf(
     else:
         SPECIAL_CASES = SPECIAL_CASES_WITHDRAWN
 
-    if drug_name in SPECIAL_CASES:
+    if resolver is not None:
+        url_path = resolver.slug(drug_name)
+    elif drug_name in SPECIAL_CASES:
         url_path = SPECIAL_CASES[drug_name]
     else:
-        url_path = f"{drug_name.replace(' ', '-').lower()}-epar-product-information"
+        url_path = default_slug(drug_name)
 
-    url = f"https://www.ema.europa.eu/{language}/documents/product-information/{url_path}_{language}.pdf"
+    url = pdf_url(url_path, language)
     file_name = f"{drug_name.replace(' ', '-')}.pdf"
     file_path = f"{dl_path}/{file_name}"
-    if os.path.exists(file_path):
-        logger.info(f"The file {file_path} already exists. Download skipped.")
+    file_old_path = f"{dl_path}/{file_name[:-len('.pdf')]}_old.pdf"
+    if inventory is None:
+        inventory = Inventory.of_files([file_path, file_old_path])
+    file_exists = inventory.exists(file_path)
+    # Un fichier existant n'est retéléchargé qu'à la demande (revalidate) : GET conditionnel s'il figure dans le
+    # manifest, sinon GET complet (ex. nouvelle révision d'un fichier téléchargé avant l'ajout du manifest)
+    if file_exists and not revalidate:
+        logger.info("The file {} already exists. Download skipped.", file_path)
+        registry.resolve_failure(drug_name, status)
+        if journal is not None and journal.state(file_path) in (QUEUED, IN_FLIGHT):
+            journal.done(file_path)
         return
 
-    not_found_file = "not_found_urls.csv"
-    if os.path.exists(not_found_file):
-        df_not_found = pd.read_csv(not_found_file)
-        if (df_not_found["Name"] == drug_name).any():
-            logger.info(f"{drug_name} already marked as not found. Download skipped.")
-            return
+    # Un 404 connu n'est retenté qu'une fois, pour chercher le bon slug
+    if registry.is_not_found(drug_name) and (resolver is None or resolver.was_tried(drug_name)):
+        logger.info("{} already marked as not found. Download skipped.", drug_name)
+        registry.resolve_failure(drug_name, status)
+        if journal is not None and journal.state(file_path) in (QUEUED, IN_FLIGHT):
+            journal.done(file_path)
+        return
 
-    async with sem:
-        try:
-            logger.info(f"Downloading {index}/{total_count} : {drug_name}")
-            retries = 0
-            while retries < nb_retries:
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        content = await resp.read()
-                        with open(file_path, "wb") as f:
-                            f.write(content)
-                        logger.success(f"Success: {drug_name}")
+    # En-têtes conditionnels si une version locale (actuelle ou _old) est connue du manifest
+    headers: dict[str, str] = {}
+    if manifest is not None and (file_exists or inventory.exists(file_old_path)):
+        headers = manifest.conditional_headers(file_path)
+
+    # Reprise d'un téléchargement interrompu à partir de la taille du fichier partiel
+    offset = 0
+    resume_etag = journal.resume_etag(file_path) if journal is not None else None
+    if resume_etag:
+        offset = inventory.storage.partial_size(file_path)
+    if offset and resume_etag:
+        headers = {"Range": f"bytes={offset}-", "If-Range": resume_etag}
+        logger.info("Resuming {} from byte {}.", drug_name, offset)
+    if journal is not None:
+        journal.start(file_path, drug_name, dl_path)
+
+    try:
+        logger.info("Downloading {}/{} : {}", index, total_count, drug_name)
+        retries = 0
+        resolve_slug = False
+        retry_delay = 0.0
+        while retries < nb_retries:
+            # Le limiteur est repris à chaque tentative pour respecter une éventuelle pause globale
+            wait_start = time.perf_counter()
+            async with limiter:
+                request_start = time.perf_counter()
+                run_metrics.observe("limiter_wait_seconds", request_start - wait_start)
+                async with session.get(url, headers=headers) as resp:
+                    run_metrics.observe("time_to_first_byte_seconds", time.perf_counter() - request_start)
+                    run_metrics.inc("requests_total", status=resp.status)
+                    if resp.status in (200, 206):
+                        # 206 : le serveur reprend au bon octet ; 200 : le document a changé, on repart de zéro
+                        start = offset if resp.status == 206 and content_range_start(resp) == offset else 0
+                        if resp.status == 206 and not start:
+                            inventory.storage.discard_partial(file_path)
+                            raise aiohttp.ClientPayloadError(f"Unexpected Content-Range for {drug_name}")
+                        if journal is not None:
+                            journal.receiving(file_path, resp.headers.get("ETag"))
+                        size, sha256 = await inventory.storage.write_stream(resp, file_path, start)
+                        run_metrics.inc("bytes_downloaded_total", size - start)
+                        run_metrics.observe("request_duration_seconds", time.perf_counter() - request_start)
+                        if store is not None:
+                            # Le fichier devient une vue de l'objet du store (version conservée dans l'historique)
+                            store.add(file_path, sha256, drug_name, language, status, url, size)
+                        inventory.add(file_path, size)
+                        if journal is not None:
+                            journal.done(file_path, size)
+                        limiter.on_success()
+                        if manifest is not None:
+                            manifest.record(
+                                file_path,
+                                url,
+                                etag=resp.headers.get("ETag"),
+                                last_modified=resp.headers.get("Last-Modified"),
+                                content_length=size,
+                                sha256=sha256)
+                        registry.resolve_failure(drug_name, status)
+                        registry.resolve_not_found(drug_name)
+                        logger.success("Success: {}", drug_name)
+                        return
+                    elif resp.status == 304:
+                        limiter.on_success()
+                        # Document inchangé : on restaure l'ancienne version si elle a été renommée
+                        if not inventory.exists(file_path) and inventory.exists(file_old_path):
+                            inventory.storage.move(file_old_path, file_path)
+                            inventory.move(file_old_path, file_path)
+                        registry.resolve_failure(drug_name, status)
+                        if journal is not None:
+                            journal.done(file_path)
+                        logger.info("Not modified: {} is up to date.", drug_name)
                         return
                     elif resp.status == 404:
-                        logger.error(f"Error 404 for {drug_name}")
-                        not_found_file = "not_found_urls.csv"
-                        df_404 = pd.DataFrame([[drug_name, status, url]], columns=["Name", "Status","Url"])
-                        echec = False
-                        if os.path.exists(not_found_file):
-                            df_404_existing = pd.read_csv(not_found_file)
+                        limiter.on_success()
+                        run_metrics.inc("not_found_total")
+                        if resolver is not None and not resolver.was_tried(drug_name):
+                            resolve_slug = True
                         else:
-                            df_404_existing = pd.DataFrame(columns=["Name", "Status", "Url"])
-                        if not (df_404_existing["Name"] == drug_name).any():
-                            df_404_final = pd.concat([df_404_existing, df_404], ignore_index=True)
-                            df_404_final.to_csv(not_found_file, index=False)
-                            logger.info(f"{drug_name} recorded in {not_found_file}")
-                        return
-                    elif resp.status == 429:
-                        logger.warning(f"Error 429 : too many requests for {drug_name}. Retrying...({retries + 1}/{nb_retries})")
-                        sleeptime = random.randint(1, 15)
-                        await asyncio.sleep(sleeptime)
+                            logger.error("Error 404 for {}", drug_name)
+                            registry.record_not_found(drug_name, status, url)
+                            if journal is not None:
+                                journal.done(file_path)
+                            return
+                    elif resp.status == 416:
+                        # Fichier partiel inutilisable : nouvelle tentative depuis le début
+                        inventory.storage.discard_partial(file_path)
+                        offset = 0
+                        headers = {}
+                        run_metrics.inc("retries_total", reason="range")
+                        retries += 1
+                    elif resp.status in (429, 503):
+                        logger.warning("Error {} : too many requests for {}. Retrying...({}/{})",
+                                       resp.status, drug_name, retries + 1, nb_retries)
+                        limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                        run_metrics.inc("throttled_total")
+                        run_metrics.inc("retries_total", reason="throttled")
                         retries += 1
-            if not echec:
-                logger.error(f"Error: Maximum number of retries ({nb_retries}) reached for {drug_name}")
-                echec = True
-        except Exception as e:
-            logger.exception(f"Exception during download of {drug_name} : {e}")
+                    else:
+                        logger.warning("Error {} for {}. Retrying...({}/{})", resp.status, drug_name, retries + 1, nb_retries)
+                        if resp.status >= 500:
+                            # Erreur serveur : l'EMA est probablement surchargée, pause globale comme pour un 503
+                            limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                        else:
+                            # Autre statut inattendu : attente exponentielle propre à ce document
+                            retry_delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retries)
+                        run_metrics.inc("retries_total", reason="status")
+                        retries += 1
+            if retry_delay:
+                # Attente hors du limiteur, pour ne pas bloquer une place de concurrence
+                await asyncio.sleep(retry_delay)
+                retry_delay = 0.0
+            if resolve_slug and resolver is not None:
+                # Slug inconnu : recherche d'un slug candidat (requêtes HEAD), une fois le limiteur libéré
+                resolve_slug = False
+                new_slug = await resolver.resolve(drug_name, lambda slug: pdf_url(slug, language), session, limiter)
+                run_metrics.inc("slug_resolutions_total", result="resolved" if new_slug else "unresolved")
+                if new_slug is None:
+                    logger.error("Error 404 for {}", drug_name)
+                    registry.record_not_found(drug_name, status, url)
+                    if journal is not None:
+                        journal.done(file_path)
+                    return
+                url = pdf_url(new_slug, language)
+                headers = {}
+        if not echec:
+            logger.error("Error: Maximum number of retries ({}) reached for {}", nb_retries, drug_name)
             echec = True
+    except Exception as e:
+        logger.exception("Exception during download of {} : {}", drug_name, e)
+        echec = True
 
-        if echec:
-            df_echec = pd.DataFrame([[drug_name, status, url]], columns=["Name", "Status", "Url"])
-            if os.path.exists(failed_urls_file):
-                df_echec_existing = pd.read_csv(failed_urls_file)
-            else:
-                df_echec_existing = pd.DataFrame(columns=["Name", "Status", "Url"])
-            if not (df_echec_existing["Name"] == drug_name).any():
-                df_echec_final = pd.concat([df_echec_existing, df_echec], ignore_index=True)
-                df_echec_final.to_csv(failed_urls_file, index=False)
-                logger.info(f"{drug_name} recorded in {failed_urls_file}")
+    if echec:
+        run_metrics.inc("download_errors_total")
+        registry.record_failure(drug_name, status, url)
+        if journal is not None:
+            journal.fail(file_path)
 
 
 async def retry_failed_downloads(
-        failed_urls_file: str,
+        registry: FailureRegistry,
         dl_path: str,
         status: str,
         language: str = "en",
         nb_workers: int = 3,
-        not_found_file: str = "not_found_urls.csv",
+        manifest: Manifest | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+        session: aiohttp.ClientSession | None = None,
+        inventory: Inventory | None = None,
+        journal: RunJournal | None = None,
+        resolver: SlugResolver | None = None,
+        store: BlobStore | None = None,
+        names: AbstractSet[str] | None = None,
         ) -> bool:
 
-    if not os.path.exists(failed_urls_file):
-        logger.info("No failed_urls.csv file found. No downloads to retry.")
-        return False
-
-    df_failed = pd.read_csv(failed_urls_file)
+    # names : ne relancer que les échecs d'un sous-ensemble de médicaments (ex. la part d'un worker)
+    failed = [(name, url) for name, url in registry.failed(status) if names is None or name in names]
+    df_failed = pd.DataFrame(failed, columns=["Name", "Url"])
     if df_failed.empty:
-        logger.info("The failed_urls.csv file is empty. No downloads to retry.")
+        logger.info(f"No failed {status} downloads to retry.")
         return False
 
     total_count = len(df_failed)
-    os.makedirs(dl_path, exist_ok=True)
+    run_metrics.inc("retry_passes_total", status=status)
 
     # Telechargement des fichiers échoués
-    sem = asyncio.Semaphore(nb_workers)
-    async with aiohttp.ClientSession() as session:
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(initial_concurrency=nb_workers)
+    if inventory is None:
+        inventory = Inventory([dl_path])
+    async with use_session(session) as session:
         tasks = []
         for idx, row in enumerate(df_failed.itertuples(), 1):
-            drug_name = row.Name
-            file_path = f"{dl_path}/{drug_name}.pdf"
             tasks.append(download_pdf(
                     language,
                     row,
@@ -171,32 +387,26 @@ async def retry_failed_downloads(
                     total_count,
                     dl_path,
                     session,
-                    sem,
-                    failed_urls_file,
-                    status))
+                    limiter,
+                    registry,
+                    status,
+                    manifest,
+                    inventory=inventory,
+                    journal=journal,
+                    resolver=resolver,
+                    store=store))
         await asyncio.gather(*tasks)
+    if manifest is not None:
+        manifest.save()
+    registry.flush()
 
-    if os.path.exists(failed_urls_file):
-        df_failed = pd.read_csv(failed_urls_file)
-
-    # Supprimer ceux qui ont été téléchargés
-        df_failed = df_failed[~df_failed["Name"].apply(lambda drug_name: os.path.exists(f"{dl_path}/{drug_name}.pdf"))]
-
-    # Supprimer ceux en 404
-    if os.path.exists(not_found_file):
-        df_404 = pd.read_csv(not_found_file)
-        df_failed = df_failed[~df_failed["Name"].isin(df_404["Name"])]
-
-    # S'il ne reste rien, on supprime le fichier
-    if df_failed.shape[0] == 0:
-        os.remove(failed_urls_file)
-        logger.info("All files have been downloaded, deleting the failed_urls.csv file.")
+    # Les fichiers téléchargés et les 404 ont été retirés du registre par download_pdf
+    nb_remaining = sum(1 for name, _ in registry.failed(status) if names is None or name in names)
+    if nb_remaining == 0:
+        logger.info(f"All failed {status} files have been downloaded.")
         return False
-    else:
-        # Sinon, on met à jour la liste
-        df_failed.to_csv(failed_urls_file, index=False)
-        logger.info(f"{len(df_failed)} files remain to be downloaded.")
-        return True
+    logger.info(f"{nb_remaining} files remain to be downloaded.")
+    return True
 
 
 # Fonction principale pour télécharger les fichiers PDF
@@ -205,18 +415,37 @@ async def download_files(
     df_light: pd.DataFrame,
     dl_path: str,
     nb_workers: int,
-    failed_urls_file: str,
-    status: str 
+    registry: FailureRegistry,
+    status: str,
+    manifest: Manifest | None = None,
+    revalidate: bool = False,
+    failed_urls_file: str | None = None,
+    limiter: AdaptiveRateLimiter | None = None,
+    session: aiohttp.ClientSession | None = None,
+    names: AbstractSet[str] | None = None,
+    inventory: Inventory | None = None,
+    journal: RunJournal | None = None,
+    resolver: SlugResolver | None = None,
+    store: BlobStore | None = None,
+    retry_passes: int | None = None
 ):
+    # retry_passes : nombre maximal de passes de relance des échecs (None : jusqu'à ce qu'il n'en reste plus)
+    # Restreindre le téléchargement à un sous-ensemble de médicaments (ex. ceux d'un ChangeSet)
+    if names is not None:
+        df_light = df_light[df_light["Name"].isin(list(names))]
     total_count = len(df_light)
-    os.makedirs(dl_path, exist_ok=True)
 
-    sem = asyncio.Semaphore(nb_workers)
-    async with aiohttp.ClientSession() as session:
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(initial_concurrency=nb_workers)
+    if inventory is None:
+        inventory = Inventory([dl_path])
+    if journal is not None:
+        # Journaliser les téléchargements à faire avant de commencer
+        to_download = df_light["Name"] if revalidate else inventory.missing(dl_path, df_light["Name"])
+        journal.queue(dl_path, [name for name in to_download if not registry.is_not_found(name)])
+    async with use_session(session) as session:
         tasks = []
         for idx, row in enumerate(df_light.itertuples(), 1):
-            drug_name = row.Name
-            file_path = f"{dl_path}/{drug_name}.pdf"
             tasks.append(
                 download_pdf(
                     language,
@@ -225,16 +454,87 @@ async def download_files(
                     total_count,
                     dl_path,
                     session,
-                    sem,
-                    failed_urls_file,
-                    status
+                    limiter,
+                    registry,
+                    status,
+                    manifest,
+                    revalidate,
+                    inventory,
+                    journal,
+                    resolver,
+                    store
                 )
             )
         await asyncio.gather(*tasks)
+        if manifest is not None:
+            manifest.save()
+
+        nb_passes = 0
+        while retry_passes is None or nb_passes < retry_passes:
+            nb_passes += 1
+            if not await retry_failed_downloads(registry,
+                                                dl_path, status,
+                                                language,
+                                                nb_workers,
+                                                manifest=manifest,
+                                                limiter=limiter,
+                                                session=session,
+                                                inventory=inventory,
+                                                journal=journal,
+                                                resolver=resolver,
+                                                store=store,
+                                                names=names):
+                break
+            logger.info("Retrying failed files...")
+
+    registry.flush()
+    if failed_urls_file is not None:
+        registry.export_csv(failed_urls_file, FAILED, status)
+
 
-    while await retry_failed_downloads(failed_urls_file,
-                                       dl_path, status,
-                                       language,
-                                       nb_workers,
-                                       not_found_file="not_found_urls.csv"):
-        logger.info("Retrying failed files...")
+# Mode multilingue : les couples (médicament, langue) de toutes les langues passent par le même limiteur
+# et la même session ; chaque langue a son dossier (language_path) et son registre des échecs
+async def download_files_languages(
+    languages: list[str],
+    df_light: pd.DataFrame,
+    dl_path: str,
+    nb_workers: int,
+    registries: dict[str, FailureRegistry],
+    status: str,
+    manifest: Manifest | None = None,
+    revalidate: bool = False,
+    failed_urls_file: str | None = None,
+    limiter: AdaptiveRateLimiter | None = None,
+    session: aiohttp.ClientSession | None = None,
+    names: dict[str, AbstractSet[str] | None] | None = None,
+    inventory: Inventory | None = None,
+    journal: RunJournal | None = None,
+    resolver: SlugResolver | None = None,
+    store: BlobStore | None = None
+):
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(initial_concurrency=nb_workers)
+    if inventory is None:
+        inventory = Inventory([language_path(dl_path, language) for language in languages])
+    async with use_session(session) as session:
+        await asyncio.gather(*(
+            download_files(
+                language,
+                df_light,
+                language_path(dl_path, language),
+                nb_workers,
+                registries[language],
+                status,
+                manifest,
+                revalidate,
+                language_path(failed_urls_file, language) if failed_urls_file is not None else None,
+                limiter,
+                session,
+                names.get(language) if names is not None else None,
+                inventory,
+                journal,
+                resolver,
+                store
+            )
+            for language in languages
+        ))
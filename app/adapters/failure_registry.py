@@ -0,0 +1,149 @@
+import csv
+import glob
+import os
+from loguru import logger
+from sqlalchemy import Column, MetaData, String, Table, delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from adapters.sqlite_engine import create_sqlite_engine
+
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
+metadata = MetaData()
+
+failures_table = Table(
+    "failures",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("status", String, primary_key=True),
+    Column("kind", String, primary_key=True),  # "not_found" ou "failed"
+    Column("url", String),
+)
+
+
+# Registre des échecs (404 et téléchargements échoués) partagé pendant tout le run :
+# recherches en mémoire (ensembles), persistance SQLite par lots
+class FailureRegistry:
+
+    def __init__(self, db_path: str = "failure_registry.db", batch_size: int = 50, import_legacy: bool = True):
+        is_new = not os.path.exists(db_path)
+        self.engine = create_sqlite_engine(db_path)
+        metadata.create_all(self.engine)
+        self.batch_size = batch_size
+        self._not_found: dict[str, tuple[str, str]] = {}  # name -> (status, url)
+        self._failed: dict[str, dict[str, str]] = {}  # status -> {name: url}
+        self._pending: list[tuple[str, dict]] = []  # ("insert" | "delete", ligne), dans l'ordre
+
+        with self.engine.connect() as conn:
+            for row in conn.execute(select(failures_table)):
+                self._load(row.name, row.status, row.kind, row.url)
+        if is_new and import_legacy:
+            self._import_legacy_csv()
+        logger.info(
+            f"Failure registry loaded from {db_path} "
+            f"({len(self._not_found)} not found, {sum(len(v) for v in self._failed.values())} failed).")
+
+    def _load(self, name: str, status: str, kind: str, url: str) -> None:
+        if kind == NOT_FOUND:
+            self._not_found[name] = (status, url)
+        else:
+            self._failed.setdefault(status, {})[name] = url
+
+    # Reprise des anciens fichiers not_found_urls.csv / failed_urls_*.csv au premier lancement
+    def _import_legacy_csv(self) -> None:
+        sources = [("not_found_urls.csv", NOT_FOUND)]
+        sources += [(path, FAILED) for path in glob.glob("failed_urls_*.csv")]
+        for path, kind in sources:
+            if not os.path.exists(path):
+                continue
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if kind == NOT_FOUND:
+                        self.record_not_found(row["Name"], row["Status"], row["Url"])
+                    else:
+                        self.record_failure(row["Name"], row["Status"], row["Url"])
+            logger.info(f"Imported {path} into the failure registry.")
+        self.flush()
+
+    def is_not_found(self, name: str) -> bool:
+        return name in self._not_found
+
+    def is_failed(self, name: str, status: str) -> bool:
+        return name in self._failed.get(status, {})
+
+    def failed(self, status: str) -> list[tuple[str, str]]:
+        return list(self._failed.get(status, {}).items())
+
+    def record_not_found(self, name: str, status: str, url: str) -> None:
+        self.resolve_failure(name, status)
+        if name in self._not_found:
+            return
+        self._not_found[name] = (status, url)
+        self._queue_insert(name, status, NOT_FOUND, url)
+        logger.info(f"{name} recorded as not found.")
+
+    def record_failure(self, name: str, status: str, url: str) -> None:
+        if self.is_failed(name, status):
+            return
+        self._failed.setdefault(status, {})[name] = url
+        self._queue_insert(name, status, FAILED, url)
+        logger.info(f"{name} recorded as failed.")
+
+    def resolve_failure(self, name: str, status: str) -> None:
+        if not self.is_failed(name, status):
+            return
+        del self._failed[status][name]
+        self._pending.append(("delete", {"name": name, "status": status, "kind": FAILED}))
+        self._maybe_flush()
+
+    # Un médicament noté 404 a finalement été trouvé (ex. slug résolu)
+    def resolve_not_found(self, name: str) -> None:
+        if name not in self._not_found:
+            return
+        status, _ = self._not_found.pop(name)
+        self._pending.append(("delete", {"name": name, "status": status, "kind": NOT_FOUND}))
+        self._maybe_flush()
+
+    def _queue_insert(self, name: str, status: str, kind: str, url: str) -> None:
+        self._pending.append(("insert", {"name": name, "status": status, "kind": kind, "url": url}))
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    # Écrit les modifications en attente, dans l'ordre, en une seule transaction
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        with self.engine.begin() as conn:
+            for op, row in pending:
+                if op == "insert":
+                    conn.execute(sqlite_insert(failures_table).on_conflict_do_nothing(), row)
+                else:
+                    conn.execute(delete(failures_table).where(
+                        failures_table.c.name == row["name"],
+                        failures_table.c.status == row["status"],
+                        failures_table.c.kind == row["kind"]))
+
+    # Export CSV (lecture humaine) au format historique Name,Status,Url ; les échecs s'exportent par statut
+    def export_csv(self, path: str, kind: str, status: str | None = None) -> None:
+        if kind == NOT_FOUND:
+            rows = [(name, st, url) for name, (st, url) in self._not_found.items()]
+        else:
+            if status is None:
+                raise ValueError(f"export_csv({path!r}, {kind!r}) requires a status")
+            rows = [(name, status, url) for name, url in self._failed.get(status, {}).items()]
+        if not rows:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Name", "Status", "Url"])
+            writer.writerows(rows)
+
+    def close(self) -> None:
+        self.flush()
+        self.engine.dispose()
@@ -0,0 +1,38 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import aiohttp
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"  # noqa: E501
+
+
+# Session HTTP unique pour tout le run : pool de connexions keep-alive, limite par hôte
+# et cache DNS, afin de réutiliser les connexions TCP/TLS vers ema.europa.eu
+def create_session(
+        limit: int = 32,
+        limit_per_host: int = 16,
+        dns_ttl: int = 600,
+        keepalive_timeout: float = 60.0
+) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=dns_ttl,
+        keepalive_timeout=keepalive_timeout,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+# Réutilise la session fournie, ou en ouvre une (fermée en sortie) pour un appel isolé
+@asynccontextmanager
+async def use_session(session: aiohttp.ClientSession | None) -> AsyncIterator[aiohttp.ClientSession]:
+    if session is not None:
+        yield session
+        return
+    async with create_session() as new_session:
+        yield new_session
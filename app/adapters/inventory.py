@@ -0,0 +1,72 @@
+import os
+import time
+from loguru import logger
+from adapters.storage import LocalStorage, S3Storage
+
+
+# Inventaire des dossiers de PDF : un seul parcours par dossier (os.scandir, ou listage S3 paginé),
+# puis mise à jour en mémoire lors des écritures, renommages et suppressions (pas de test d'existence
+# par médicament). Le stockage (local ou S3) est partagé par toutes les étapes via l'inventaire
+class Inventory:
+
+    def __init__(self, dl_paths: list[str] | None = None, storage: LocalStorage | S3Storage | None = None):
+        self.storage = storage if storage is not None else LocalStorage()
+        self.entries: dict[str, dict[str, tuple[int, float]]] = {}  # dossier -> {fichier: (taille, mtime)}
+        for dl_path in dl_paths or []:
+            self.scan(dl_path)
+
+    # Inventaire limité à quelques fichiers (un stat par fichier, sans parcourir leurs dossiers), pour un
+    # téléchargement isolé qui ne reçoit pas l'inventaire partagé du run
+    @classmethod
+    def of_files(cls, file_paths: list[str]) -> "Inventory":
+        inventory = cls()
+        for file_path in file_paths:
+            dl_path, file_name = os.path.split(file_path)
+            files = inventory.entries.setdefault(os.path.normpath(dl_path), {})
+            if os.path.isfile(file_path):
+                files[file_name] = inventory.storage.stat(file_path)
+        return inventory
+
+    def scan(self, dl_path: str) -> None:
+        files = self.storage.scan(dl_path)
+        self.entries[os.path.normpath(dl_path)] = files
+        logger.info(f"Inventory of {dl_path}: {len(files)} files.")
+
+    def _files(self, dl_path: str) -> dict[str, tuple[int, float]]:
+        key = os.path.normpath(dl_path)
+        if key not in self.entries:
+            self.scan(dl_path)
+        return self.entries[key]
+
+    def exists(self, file_path: str) -> bool:
+        dl_path, file_name = os.path.split(file_path)
+        return file_name in self._files(dl_path)
+
+    def get(self, file_path: str) -> tuple[int, float] | None:
+        dl_path, file_name = os.path.split(file_path)
+        return self._files(dl_path).get(file_name)
+
+    def add(self, file_path: str, size: int | None = None) -> None:
+        dl_path, file_name = os.path.split(file_path)
+        if size is None:
+            self._files(dl_path)[file_name] = self.storage.stat(file_path)
+        else:
+            self._files(dl_path)[file_name] = (size, time.time())
+
+    def remove(self, file_path: str) -> None:
+        dl_path, file_name = os.path.split(file_path)
+        self._files(dl_path).pop(file_name, None)
+
+    def move(self, src_path: str, dst_path: str) -> None:
+        src_dir, src_name = os.path.split(src_path)
+        dst_dir, dst_name = os.path.split(dst_path)
+        entry = self._files(src_dir).pop(src_name, None)
+        if entry is not None:
+            self._files(dst_dir)[dst_name] = entry
+
+    # Noms des médicaments (nom de fichier sans .pdf) présents dans dl_path
+    def names(self, dl_path: str) -> set[str]:
+        return {f[:-len(".pdf")] for f in self._files(dl_path) if f.endswith(".pdf")}
+
+    def missing(self, dl_path: str, names) -> set[str]:
+        return set(names) - self.names(dl_path)
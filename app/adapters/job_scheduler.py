@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+import aiohttp
+import pandas as pd
+from loguru import logger
+from adapters.download_file import download_pdf
+from adapters.manifest import Manifest
+from adapters.failure_registry import FailureRegistry
+from adapters.rate_limiter import AdaptiveRateLimiter
+from adapters.inventory import Inventory
+from adapters.run_journal import RunJournal
+from adapters.metrics import run_metrics
+from adapters.slug_resolver import SlugResolver
+from adapters.blob_store import BlobStore
+
+# Priorités des téléchargements (la plus petite passe en premier)
+PRIORITY_UPDATE = 0
+PRIORITY_AUTHORISED = 1
+PRIORITY_WITHDRAWN = 2
+PRIORITY_REVALIDATE = 3  # revérification des fichiers déjà téléchargés
+
+
+# Téléchargement d'un RCP (un médicament, une langue)
+@dataclass
+class Job:
+    row: Any  # ligne du DataFrame simplifié (namedtuple de itertuples : row.Name, row.Revision_nb)
+    language: str
+    dl_path: str
+    status: str
+    priority: int
+    revalidate: bool = False
+    after: Callable[[str], None] | None = None  # appelé avec le nom une fois le document traité
+    attempts: int = 0
+
+
+# File de priorité unique pour tous les téléchargements du run : nouvelles révisions, puis nouveaux authorised,
+# puis withdrawn, puis revérifications. Un téléchargement échoué est remis dans la file avec un délai croissant
+# (au lieu de passes de relance successives) et les autres téléchargements continuent pendant ce délai.
+# Le hook "after" d'un job (changement de statut, suppression de l'ancienne version) est appliqué dès que
+# le document est traité
+class JobScheduler:
+
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            limiter: AdaptiveRateLimiter,
+            registries: dict[str, FailureRegistry],
+            manifest: Manifest | None = None,
+            inventory: Inventory | None = None,
+            journal: RunJournal | None = None,
+            resolver: SlugResolver | None = None,
+            store: BlobStore | None = None,
+            max_attempts: int = 3,
+            retry_backoff: float = 30.0,
+            save_every: int = 200
+    ):
+        self.session = session
+        self.limiter = limiter
+        self.registries = registries
+        self.manifest = manifest
+        self.inventory = inventory if inventory is not None else Inventory()
+        self.journal = journal
+        self.resolver = resolver
+        self.store = store
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.save_every = save_every
+
+        self._ready: list[tuple[int, int, Job]] = []  # (priorité, ordre d'arrivée, job)
+        self._delayed: list[tuple[float, int, Job]] = []  # (échéance time.monotonic, ordre d'arrivée, job)
+        self._seq = itertools.count()
+        self._submitted: set[str] = set()  # chemins des fichiers déjà en file
+        self._in_flight = 0
+        self._nb_done = 0
+        self._cond = asyncio.Condition()
+
+    def submit(self, job: Job, not_before: float = 0.0) -> None:
+        if not_before > time.monotonic():
+            heapq.heappush(self._delayed, (not_before, next(self._seq), job))
+        else:
+            heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+
+    # Met en file les RCP d'un dossier (names : sous-ensemble de médicaments). Un fichier déjà en file
+    # (ex. nouvelle révision, prioritaire) n'est pas ajouté une seconde fois
+    def add_downloads(
+            self,
+            df_light: pd.DataFrame,
+            dl_path: str,
+            status: str,
+            language: str,
+            priority: int,
+            names=None,
+            revalidate: bool = False,
+            after: Callable[[str], None] | None = None
+    ) -> int:
+        if names is not None:
+            df_light = df_light.loc[df_light["Name"].isin(list(names))]
+        all_rows: list[Any] = list(df_light.itertuples())
+        rows = [row for row in all_rows if f"{dl_path}/{row.Name}.pdf" not in self._submitted]
+        registry = self.registries[language]
+        if self.journal is not None:
+            # Journaliser les téléchargements à faire avant de commencer
+            row_names = [row.Name for row in rows]
+            to_download = row_names if revalidate else self.inventory.missing(dl_path, row_names)
+            self.journal.queue(dl_path, [name for name in to_download if not registry.is_not_found(name)])
+        for row in rows:
+            self._submitted.add(f"{dl_path}/{row.Name}.pdf")
+            self.submit(Job(row, language, dl_path, status, priority, revalidate, after))
+        logger.info(f"{len(rows)} {status} jobs queued for {dl_path} (priority {priority}).")
+        return len(rows)
+
+    # Échéances passées : les jobs en attente de relance redeviennent disponibles
+    def _promote(self, now: float) -> None:
+        while self._delayed and self._delayed[0][0] <= now:
+            _, seq, job = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (job.priority, seq, job))
+
+    async def _next_job(self) -> Job | None:
+        async with self._cond:
+            while True:
+                now = time.monotonic()
+                self._promote(now)
+                if self._ready:
+                    self._in_flight += 1
+                    return heapq.heappop(self._ready)[2]
+                if not self._delayed and self._in_flight == 0:
+                    self._cond.notify_all()
+                    return None
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _execute(self, job: Job) -> None:
+        registry = self.registries[job.language]
+        drug_name = job.row.Name
+        job.attempts += 1
+        await download_pdf(
+            job.language,
+            job.row,
+            self._nb_done + 1,
+            len(self._submitted),
+            job.dl_path,
+            self.session,
+            self.limiter,
+            registry,
+            job.status,
+            self.manifest,
+            job.revalidate,
+            self.inventory,
+            self.journal,
+            self.resolver,
+            self.store)
+        if registry.is_failed(drug_name, job.status) and job.attempts < self.max_attempts:
+            delay = self.retry_backoff * 2 ** (job.attempts - 1)
+            run_metrics.inc("retries_total", reason="requeued")
+            logger.info("{} requeued, next attempt in {:.0f}s ({}/{}).", drug_name, delay, job.attempts + 1,
+                        self.max_attempts)
+            self.submit(job, time.monotonic() + delay)
+            return
+        if job.after is not None:
+            job.after(drug_name)
+        self._nb_done += 1
+        if self.manifest is not None and self._nb_done % self.save_every == 0:
+            self.manifest.save()
+
+    async def _worker(self) -> None:
+        while (job := await self._next_job()) is not None:
+            try:
+                await self._execute(job)
+            except Exception as exc:
+                logger.exception(f"Job {job.dl_path}/{job.row.Name} failed: {exc}")
+            finally:
+                async with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    # Exécute tous les jobs (y compris les relances) ; le limiteur fixe le nombre de requêtes simultanées
+    async def run(self) -> None:
+        self._cond = asyncio.Condition()
+        await asyncio.gather(*(self._worker() for _ in range(self.limiter.max_concurrency)))
+        for registry in self.registries.values():
+            registry.flush()
+        if self.manifest is not None:
+            self.manifest.save()
+        logger.info(f"Scheduler: {self._nb_done} jobs processed.")
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from loguru import logger
+
+
+# Manifest persistant des PDF téléchargés (ETag, Last-Modified, taille, hash)
+class Manifest:
+
+    def __init__(self, manifest_path: str = "manifest.json"):
+        self.manifest_path = manifest_path
+        self.entries: dict[str, dict] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+            logger.info(f"Manifest loaded from {manifest_path} ({len(self.entries)} entries).")
+
+    def get(self, file_path: str) -> dict | None:
+        return self.entries.get(file_path)
+
+    def conditional_headers(self, file_path: str) -> dict[str, str]:
+        # En-têtes If-None-Match / If-Modified-Since pour un GET conditionnel
+        entry = self.entries.get(file_path)
+        headers: dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(
+            self,
+            file_path: str,
+            url: str,
+            etag: str | None,
+            last_modified: str | None,
+            content_length: int,
+            sha256: str
+    ) -> None:
+        self.entries[file_path] = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_length": content_length,
+            "sha256": sha256,
+            "recorded_at": time.time(),
+        }
+
+    def move(self, src_path: str, dst_path: str) -> None:
+        if src_path in self.entries:
+            self.entries[dst_path] = self.entries.pop(src_path)
+
+    def remove(self, file_path: str) -> None:
+        self.entries.pop(file_path, None)
+
+    # Fusion de manifests écrits par d'autres processus (crawl réparti) : pour un même fichier,
+    # l'entrée enregistrée le plus récemment l'emporte
+    def merge(self, manifest_paths: list[str]) -> None:
+        for manifest_path in manifest_paths:
+            if not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for file_path, entry in entries.items():
+                current = self.entries.get(file_path)
+                if current is None or entry.get("recorded_at", 0) > current.get("recorded_at", 0):
+                    self.entries[file_path] = entry
+            logger.info(f"Manifest {manifest_path} merged ({len(entries)} entries).")
+
+    def save(self) -> None:
+        # Écriture atomique : fichier temporaire puis remplacement
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        logger.info(f"Manifest saved to {self.manifest_path} ({len(self.entries)} entries).")
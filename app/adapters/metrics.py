@@ -0,0 +1,164 @@
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+from loguru import logger
+
+# Bornes (secondes) des histogrammes de durée
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+PROMETHEUS_PREFIX = "ema_rcp"
+
+HELP = {
+    "requests_total": "HTTP requests sent to the EMA website, by status code.",
+    "bytes_downloaded_total": "Bytes received in PDF and index bodies.",
+    "retries_total": "Download attempts retried, by reason.",
+    "not_found_total": "Documents answered with HTTP 404.",
+    "throttled_total": "Responses asking to slow down (429/503).",
+    "download_errors_total": "Downloads abandoned after exceptions or too many retries.",
+    "retry_passes_total": "Passes of retry_failed_downloads.",
+    "corrupt_pdfs_total": "Stored PDFs failing verification, removed for re-download.",
+    "slug_resolutions_total": "URL slug resolutions attempted after a 404, by result.",
+    "request_duration_seconds": "Duration of a download request, until the body is stored.",
+    "time_to_first_byte_seconds": "Time until the response headers are received.",
+    "limiter_wait_seconds": "Time spent waiting for the rate limiter.",
+    "phase_duration_seconds": "Duration of each pipeline phase.",
+}
+
+
+class Histogram:
+
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        total, result = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def _labels(labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# Mesures d'un run : compteurs, histogrammes (latence, TTFB, attente du limiteur) et durées des étapes,
+# exportées en rapport JSON et en fichier texte Prometheus (textfile collector)
+class RunMetrics:
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters: defaultdict[tuple[str, tuple], float] = defaultdict(float)
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.phases: dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        self.counters[(name, _labels(labels))] += value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+            logger.info("Phase {} finished in {:.1f}s", name, duration)
+
+    def to_dict(self) -> dict:
+        counters: dict[str, dict[str, float]] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "total"] = value
+        histograms: dict[str, dict] = {}
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            histograms.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "all"] = {
+                "count": histogram.count,
+                "sum": round(histogram.sum, 6),
+                "mean": round(histogram.sum / histogram.count, 6) if histogram.count else None,
+                "buckets": {("+Inf" if math.isinf(bound) else str(bound)): count
+                            for bound, count in histogram.cumulative()},
+            }
+        return {
+            "started_at": self.started_at,
+            "duration_s": round(time.time() - self.started_at, 3),
+            "phases_s": {name: round(duration, 3) for name, duration in self.phases.items()},
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        described: set[str] = set()
+
+        def describe(name: str, metric_type: str) -> str:
+            full_name = f"{PROMETHEUS_PREFIX}_{name}"
+            if full_name not in described:
+                described.add(full_name)
+                lines.append(f"# HELP {full_name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {full_name} {metric_type}")
+            return full_name
+
+        for (name, labels), value in sorted(self.counters.items()):
+            full_name = describe(name, "counter")
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            full_name = describe(name, "histogram")
+            for bound, count in histogram.cumulative():
+                le = 'le="+Inf"' if math.isinf(bound) else f'le="{bound}"'
+                lines.append(f"{full_name}_bucket{_format_labels(labels, le)} {count}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+        full_name = describe("phase_duration_seconds", "gauge")
+        for name, duration in self.phases.items():
+            lines.append(f'{full_name}{{phase="{name}"}} {duration}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {time.time()}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write_atomic(path: str, content: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: str) -> None:
+        self._write_atomic(path, json.dumps(self.to_dict(), indent=2))
+        logger.info(f"Run report written to {path}.")
+
+    def write_prometheus(self, path: str) -> None:
+        self._write_atomic(path, self.to_prometheus())
+        logger.info(f"Prometheus metrics written to {path}.")
+
+
+# Mesures du run en cours, partagées par tous les modules (comme le logger)
+run_metrics = RunMetrics()
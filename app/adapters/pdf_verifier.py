@@ -0,0 +1,119 @@
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from adapters.inventory import Inventory
+from adapters.manifest import Manifest
+from adapters.metrics import run_metrics
+
+PDF_HEADER = b"%PDF-"
+PDF_TRAILER = b"%%EOF"
+# Le marqueur %%EOF peut être suivi de quelques octets (fins de ligne, espaces)
+TRAILER_WINDOW = 1024
+
+
+# Vérifie un PDF stocké : taille et SHA-256 attendus (manifest), en-tête %PDF- et marqueur %%EOF final.
+# Lecture par mmap (pas de copie du fichier en mémoire). Exécutée dans un processus du pool :
+# renvoie (file_path, raison de l'échec ou None, taille, mtime)
+def verify_pdf(
+        file_path: str,
+        expected_size: int | None = None,
+        expected_sha256: str | None = None
+) -> tuple[str, str | None, int, float]:
+    try:
+        with open(file_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if size == 0:
+                return file_path, "empty file", size, stat.st_mtime
+            if expected_size is not None and size != expected_size:
+                return file_path, f"size {size} != {expected_size}", size, stat.st_mtime
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(PDF_HEADER)] != PDF_HEADER:
+                    return file_path, "missing %PDF- header", size, stat.st_mtime
+                if mm.rfind(PDF_TRAILER, max(0, size - TRAILER_WINDOW)) == -1:
+                    return file_path, "missing %%EOF trailer", size, stat.st_mtime
+                if expected_sha256 is not None and hashlib.sha256(mm).hexdigest() != expected_sha256:
+                    return file_path, "SHA-256 mismatch", size, stat.st_mtime
+        return file_path, None, size, stat.st_mtime
+    except OSError as exc:
+        return file_path, f"unreadable ({exc})", 0, 0.0
+
+
+# Vérification incrémentale des PDF téléchargés : seuls les fichiers dont la taille ou le mtime a changé
+# depuis la dernière vérification réussie (verify_state.json) sont relus, en parallèle dans un pool de processus.
+# Les fichiers corrompus sont supprimés (inventaire et manifest compris) : ils redeviennent "manquants"
+# et sont retéléchargés par l'étape suivante, sans recrawl complet
+class PdfVerifier:
+
+    def __init__(self, state_path: str = "verify_state.json", max_workers: int | None = None):
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.verified: dict[str, tuple[int, float]] = {}  # file_path -> (taille, mtime) vérifiés
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.verified = {path: tuple(value) for path, value in json.load(f).items()}
+
+    def _to_check(self, dl_paths: list[str], inventory: Inventory) -> list[str]:
+        to_check = []
+        present = set()
+        for dl_path in dl_paths:
+            for file_name in sorted(inventory.names(dl_path)):
+                file_path = f"{dl_path}/{file_name}.pdf"
+                present.add(file_path)
+                if inventory.get(file_path) != self.verified.get(file_path):
+                    to_check.append(file_path)
+        # Les fichiers disparus (supprimés, renommés) sont oubliés
+        dirs = {f"{dl_path}/" for dl_path in dl_paths}
+        self.verified = {
+            path: value for path, value in self.verified.items()
+            if path in present or not any(path.startswith(d) for d in dirs)
+        }
+        return to_check
+
+    # Renvoie {file_path: raison} pour les fichiers corrompus (déjà supprimés)
+    def verify(
+            self,
+            dl_paths: list[str],
+            inventory: Inventory,
+            manifest: Manifest | None = None
+    ) -> dict[str, str]:
+        to_check = self._to_check(dl_paths, inventory)
+        if not to_check:
+            logger.info("PDF verification: no new or modified file to check.")
+            self.save()
+            return {}
+
+        args = []
+        for file_path in to_check:
+            entry = manifest.get(file_path) if manifest is not None else None
+            args.append((file_path,
+                         entry.get("content_length") if entry else None,
+                         entry.get("sha256") if entry else None))
+        corrupt: dict[str, str] = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            results = pool.map(verify_pdf, *zip(*args), chunksize=max(1, len(args) // 64))
+            for file_path, reason, size, mtime in results:
+                if reason is None:
+                    self.verified[file_path] = (size, mtime)
+                    continue
+                corrupt[file_path] = reason
+                run_metrics.inc("corrupt_pdfs_total")
+                logger.warning(f"Corrupt PDF {file_path} ({reason}), queued for re-download.")
+                self.verified.pop(file_path, None)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                inventory.remove(file_path)
+                if manifest is not None:
+                    manifest.remove(file_path)
+        logger.info(f"PDF verification: {len(to_check)} files checked, {len(corrupt)} corrupt.")
+        self.save()
+        return corrupt
+
+    def save(self) -> None:
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.verified, f)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from loguru import logger
+from sqlalchemy import text
+from adapters.sqlite_engine import create_sqlite_engine
+
+
+# Convertit l'en-tête Retry-After (secondes ou date HTTP) en nombre de secondes
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+# Budget de requêtes commun à plusieurs processus ou machines (crawl réparti) : seau à jetons et pause
+# Retry-After stockés dans une base SQLite partagée, mis à jour par une seule requête UPDATE atomique
+class SharedRateBudget:
+
+    def __init__(self, db_path: str = "rate_budget.db", rate: float = 5.0, burst: int = 5):
+        self.rate = rate
+        self.burst = burst
+        self.engine = create_sqlite_engine(db_path)
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS budget ("
+                "id INTEGER PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, paused_until REAL NOT NULL)"))
+            conn.execute(text(
+                "INSERT OR IGNORE INTO budget (id, tokens, updated_at, paused_until) VALUES (1, :burst, :now, 0)"),
+                {"burst": burst, "now": time.time()})
+
+    # Réserve un jeton et renvoie le délai (secondes) avant de pouvoir envoyer la requête
+    def take(self) -> float:
+        now = time.time()
+        with self.engine.begin() as conn:
+            tokens, paused_until = conn.execute(text(
+                "UPDATE budget SET tokens = MIN(:burst, tokens + MAX(0, :now - updated_at) * :rate) - 1, "
+                "updated_at = MAX(updated_at, :now) WHERE id = 1 RETURNING tokens, paused_until"),
+                {"burst": self.burst, "now": now, "rate": self.rate}).one()
+        return max(0.0, -tokens / self.rate, paused_until - now)
+
+    def pause(self, delay: float) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text("UPDATE budget SET paused_until = MAX(paused_until, :until) WHERE id = 1"),
+                         {"until": time.time() + delay})
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+# Limiteur partagé par toutes les requêtes vers l'EMA :
+# - seau à jetons (débit maximal en requêtes/seconde)
+# - contrôle AIMD de la concurrence (augmentation additive tant que l'EMA répond sans erreur,
+#   diminution multiplicative sur 429/503)
+# - pause globale respectant l'en-tête Retry-After
+# - budget commun à tous les processus d'un crawl réparti (optionnel, SharedRateBudget)
+class AdaptiveRateLimiter:
+
+    def __init__(
+            self,
+            initial_concurrency: int = 5,
+            min_concurrency: int = 1,
+            max_concurrency: int = 16,
+            rate: float = 5.0,
+            min_rate: float = 0.5,
+            max_rate: float = 20.0,
+            burst: int = 5,
+            decrease_factor: float = 0.5,
+            default_backoff: float = 10.0,
+            budget: SharedRateBudget | None = None
+    ):
+        self.concurrency = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.decrease_factor = decrease_factor
+        self.default_backoff = default_backoff
+        self.budget = budget
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._successes = 0
+        self._in_flight = 0
+        self._cond: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_concurrency, int(self.concurrency))
+
+    def _condition(self) -> asyncio.Condition:
+        # La condition est liée à la boucle d'événements en cours
+        loop = asyncio.get_running_loop()
+        cond = self._cond
+        if self._loop is not loop or cond is None:
+            self._loop = loop
+            cond = self._cond = asyncio.Condition()
+            self._in_flight = 0
+        return cond
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            # Réservation d'un jeton : un solde négatif correspond au délai d'attente de ce jeton
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            delay = max(0.0, -self._tokens / self.rate)
+            if self.budget is not None:
+                delay = max(delay, await asyncio.to_thread(self.budget.take))
+            while True:
+                delay = max(delay, self._paused_until - time.monotonic())
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+                delay = 0.0
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            cond.notify(max(1, self.limit - self._in_flight))
+
+    async def __aenter__(self) -> "AdaptiveRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.release()
+
+    # Augmentation additive : +1 requête simultanée après une "fenêtre" de réponses sans erreur
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            if self.concurrency < self.max_concurrency:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.rate = min(self.max_rate, self.rate + 1)
+                logger.debug(f"Rate limiter: concurrency raised to {self.limit} ({self.rate:.1f} req/s).")
+
+    # Diminution multiplicative et pause globale sur 429/503
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        now = time.monotonic()
+        delay = retry_after if retry_after is not None else self.default_backoff
+        self._paused_until = max(self._paused_until, now + delay)
+        self._successes = 0
+        if self.budget is not None:
+            # Les autres processus du crawl respectent aussi la pause
+            self.budget.pause(delay)
+        # Une seule diminution par fenêtre de pause, même si plusieurs requêtes reçoivent un 429
+        if now >= self._last_decrease + delay:
+            self._last_decrease = now
+            self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            logger.warning(
+                f"Rate limiter: throttled by EMA, pausing {delay:.0f}s, "
+                f"concurrency lowered to {self.limit} ({self.rate:.1f} req/s).")
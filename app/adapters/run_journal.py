@@ -0,0 +1,110 @@
+import time
+from loguru import logger
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from adapters.sqlite_engine import create_sqlite_engine
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+metadata = MetaData()
+
+jobs_table = Table(
+    "jobs",
+    metadata,
+    Column("file_path", String, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("dl_path", String, nullable=False),
+    Column("state", String, nullable=False),  # queued, in_flight, done ou failed
+    Column("etag", String),  # validateur de la réponse en cours (pour If-Range)
+    Column("size", Integer),
+    Column("updated_at", Float),
+)
+
+
+# Journal du run (write-ahead) : l'état de chaque téléchargement est écrit avant et après la requête,
+# afin qu'un run interrompu reprenne exactement là où il s'est arrêté
+class RunJournal:
+
+    def __init__(self, db_path: str = "run_journal.db"):
+        self.engine = create_sqlite_engine(db_path)
+        metadata.create_all(self.engine)
+        self._states: dict[str, tuple[str, str | None]] = {}  # file_path -> (state, etag)
+        with self.engine.connect() as conn:
+            for row in conn.execute(select(jobs_table.c.file_path, jobs_table.c.state, jobs_table.c.etag)):
+                self._states[row.file_path] = (row.state, row.etag)
+        nb_unfinished = sum(1 for state, _ in self._states.values() if state in (QUEUED, IN_FLIGHT))
+        if nb_unfinished:
+            logger.info(f"Run journal {db_path}: {nb_unfinished} downloads unfinished by the previous run.")
+
+    def _write(self, file_path: str, **values) -> None:
+        values["updated_at"] = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.file_path == file_path).values(**values))
+
+    # Met en file les téléchargements d'une étape (les téléchargements en cours gardent leur état)
+    def queue(self, dl_path: str, names) -> None:
+        rows = []
+        for name in names:
+            file_path = f"{dl_path}/{name}.pdf"
+            state, _ = self._states.get(file_path, (None, None))
+            if state == IN_FLIGHT:
+                continue
+            self._states[file_path] = (QUEUED, None)
+            rows.append({"file_path": file_path, "name": name, "dl_path": dl_path, "state": QUEUED,
+                         "etag": None, "size": None, "updated_at": time.time()})
+        if not rows:
+            return
+        stmt = sqlite_insert(jobs_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["file_path"],
+            set_={"state": stmt.excluded.state, "etag": None, "size": None, "updated_at": stmt.excluded.updated_at})
+        with self.engine.begin() as conn:
+            conn.execute(stmt, rows)
+
+    def start(self, file_path: str, name: str, dl_path: str) -> None:
+        state, etag = self._states.get(file_path, (None, None))
+        if state is None:
+            with self.engine.begin() as conn:
+                conn.execute(sqlite_insert(jobs_table).on_conflict_do_nothing(), {
+                    "file_path": file_path, "name": name, "dl_path": dl_path, "state": IN_FLIGHT,
+                    "etag": None, "size": None, "updated_at": time.time()})
+        else:
+            self._write(file_path, state=IN_FLIGHT)
+        self._states[file_path] = (IN_FLIGHT, etag)
+
+    # Validateur de la réponse reçue : permet de reprendre le fichier partiel avec If-Range
+    def receiving(self, file_path: str, etag: str | None) -> None:
+        self._states[file_path] = (IN_FLIGHT, etag)
+        self._write(file_path, etag=etag)
+
+    def done(self, file_path: str, size: int | None = None) -> None:
+        self._states[file_path] = (DONE, None)
+        self._write(file_path, state=DONE, etag=None, size=size)
+
+    def fail(self, file_path: str) -> None:
+        _, etag = self._states.get(file_path, (None, None))
+        self._states[file_path] = (FAILED, etag)
+        self._write(file_path, state=FAILED)
+
+    def state(self, file_path: str) -> str | None:
+        return self._states.get(file_path, (None, None))[0]
+
+    # ETag d'un téléchargement interrompu (None si le fichier partiel n'est pas reprenable)
+    def resume_etag(self, file_path: str) -> str | None:
+        state, etag = self._states.get(file_path, (None, None))
+        return etag if state in (IN_FLIGHT, FAILED) else None
+
+    # Médicaments de dl_path mis en file ou en cours lors d'un run précédent non terminé
+    def unfinished(self, dl_path: str) -> set[str]:
+        prefix = f"{dl_path}/"
+        return {
+            file_path[len(prefix):-len(".pdf")]
+            for file_path, (state, _) in self._states.items()
+            if file_path.startswith(prefix) and state in (QUEUED, IN_FLIGHT)
+        }
+
+    def close(self) -> None:
+        self.engine.dispose()
@@ -0,0 +1,95 @@
+import hashlib
+import time
+from loguru import logger
+from sqlalchemy import Boolean, Column, Float, Integer, MetaData, String, Table, func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from adapters.sqlite_engine import create_sqlite_engine
+
+metadata = MetaData()
+
+leases_table = Table(
+    "leases",
+    metadata,
+    Column("shard", Integer, primary_key=True),
+    Column("owner", String),  # worker titulaire du bail (None : jamais attribué)
+    Column("expires_at", Float, nullable=False),  # horodatage (time.time) d'expiration du bail
+    Column("done", Boolean, nullable=False),
+    Column("updated_at", Float),
+)
+
+
+# Numéro de part d'un médicament : hash stable du nom nettoyé (identique d'un processus
+# ou d'une machine à l'autre, contrairement à hash())
+def shard_of(name: str, nb_shards: int) -> int:
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % nb_shards
+
+
+def shard_names(names, shard: int, nb_shards: int) -> set[str]:
+    return {name for name in names if shard_of(name, nb_shards) == shard}
+
+
+# Table des baux du crawl réparti (SQLite en mode WAL, sur un disque partagé entre les workers) :
+# chaque part est attribuée à un seul worker pour lease_ttl secondes, renouvelées tant qu'il travaille.
+# La part d'un worker arrêté (bail expiré) est reprise par le suivant qui demande du travail
+class LeaseTable:
+
+    def __init__(self, db_path: str = "crawl_leases.db", lease_ttl: float = 300.0):
+        self.engine = create_sqlite_engine(db_path)
+        self.lease_ttl = lease_ttl
+        metadata.create_all(self.engine)
+
+    # Crée les parts d'un nouveau crawl ; reset=True remet toutes les parts à faire
+    def init_shards(self, nb_shards: int, reset: bool = False) -> None:
+        with self.engine.begin() as conn:
+            existing = conn.execute(select(func.count()).select_from(leases_table)).scalar_one()
+            if existing and existing != nb_shards and not reset:
+                raise ValueError(f"Lease table already has {existing} shards (requested {nb_shards}); use reset")
+            if reset:
+                conn.execute(leases_table.delete())
+            conn.execute(
+                sqlite_insert(leases_table).on_conflict_do_nothing(),
+                [{"shard": shard, "owner": None, "expires_at": 0.0, "done": False, "updated_at": time.time()}
+                 for shard in range(nb_shards)])
+
+    # Attribue à owner une part non terminée, libre ou dont le bail a expiré (None : plus rien à faire).
+    # Une seule requête UPDATE : deux workers ne peuvent pas obtenir la même part
+    def acquire(self, owner: str) -> int | None:
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(text(
+                "UPDATE leases SET owner = :owner, expires_at = :expires_at, updated_at = :now "
+                "WHERE shard = (SELECT shard FROM leases WHERE NOT done AND (expires_at < :now OR owner = :owner) "
+                "ORDER BY owner = :owner DESC, shard LIMIT 1) "
+                "RETURNING shard"),
+                {"owner": owner, "expires_at": now + self.lease_ttl, "now": now}).first()
+        if row is None:
+            return None
+        logger.info(f"Worker {owner}: shard {row.shard} leased.")
+        return row.shard
+
+    # Prolonge le bail ; False si la part a été reprise par un autre worker entre-temps
+    def renew(self, owner: str, shard: int) -> bool:
+        now = time.time()
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                leases_table.update()
+                .where(leases_table.c.shard == shard, leases_table.c.owner == owner, ~leases_table.c.done)
+                .values(expires_at=now + self.lease_ttl, updated_at=now))
+        return result.rowcount == 1
+
+    def complete(self, owner: str, shard: int) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                leases_table.update()
+                .where(leases_table.c.shard == shard, leases_table.c.owner == owner)
+                .values(done=True, updated_at=time.time()))
+        logger.info(f"Worker {owner}: shard {shard} completed.")
+
+    def pending(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(leases_table).where(~leases_table.c.done)).scalar_one()
+
+    def close(self) -> None:
+        self.engine.dispose()
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+from typing import Callable
+import aiohttp
+from loguru import logger
+from adapters.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from adapters.metrics import run_metrics
+
+SLUG_SUFFIXES = ("-epar-product-information", "-product-information")
+# Suffixes de sociétés absents des slugs de l'EMA (ex. "...-h5n1-baxter-ag" -> "...-h5n1-baxter")
+COMPANY_SUFFIXES = frozenset({
+    "ab", "ag", "as", "bv", "co", "gmbh", "inc", "kg", "limited", "ltd", "nv", "oy", "pharma",
+    "pharmaceuticals", "plc", "sa", "sas", "spa", "srl", "sro",
+})
+MAX_CANDIDATES = 24
+MAX_THROTTLED_PROBES = 5
+
+
+def default_slug(drug_name: str) -> str:
+    return f"{drug_name.replace(' ', '-').lower()}-epar-product-information"
+
+
+# Slugs candidats pour un médicament dont le slug par défaut renvoie 404, du plus au moins probable :
+# suffixes de société retirés, puis tiret entre deux substances actives supprimé
+# (ex. "lamivudine-zidovudine-teva" -> "lamivudinezidovudine-teva"), avec les deux suffixes d'URL connus
+def candidate_slugs(drug_name: str, max_candidates: int = MAX_CANDIDATES) -> list[str]:
+    tokens = [t for t in drug_name.replace(" ", "-").lower().split("-") if t]
+    bases = [tokens]
+    stripped = list(tokens)
+    while len(stripped) > 1 and stripped[-1] in COMPANY_SUFFIXES:
+        stripped = stripped[:-1]
+        bases.append(stripped)
+
+    stems: list[str] = []
+    for base in reversed(bases):
+        stems.append("-".join(base))
+    for base in reversed(bases):
+        for i in range(1, len(base)):
+            stems.append("-".join(base[:i - 1] + [base[i - 1] + base[i]] + base[i + 1:]))
+
+    candidates: list[str] = []
+    for suffix in SLUG_SUFFIXES:
+        for stem in stems:
+            slug = f"{stem}{suffix}"
+            if slug not in candidates and slug != default_slug(drug_name):
+                candidates.append(slug)
+    return candidates[:max_candidates]
+
+
+# Résolution des slugs d'URL : cache persistant (slug_cache.json) des slugs trouvés, consulté avant le slug
+# par défaut ; sur un 404, des slugs candidats sont testés par requêtes HEAD et le premier trouvé est mémorisé
+class SlugResolver:
+
+    def __init__(self, cache_path: str = "slug_cache.json", seeds: dict[str, str] | None = None):
+        self.cache_path = cache_path
+        self.resolved: dict[str, str] = dict(seeds or {})  # nom du médicament -> slug
+        self.tried: set[str] = set()  # médicaments déjà résolus sans succès
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.resolved.update(data.get("resolved", {}))
+            self.tried.update(data.get("tried", []))
+            logger.info(f"Slug cache loaded from {cache_path} ({len(self.resolved)} resolved slugs).")
+        self._dirty = False
+
+    def slug(self, drug_name: str) -> str:
+        return self.resolved.get(drug_name) or default_slug(drug_name)
+
+    # Une résolution a déjà été tentée (réussie ou non) : inutile de refaire les requêtes HEAD
+    def was_tried(self, drug_name: str) -> bool:
+        return drug_name in self.tried or drug_name in self.resolved
+
+    async def _probe(
+            self,
+            url: str,
+            session: aiohttp.ClientSession,
+            limiter: AdaptiveRateLimiter
+    ) -> int | None:
+        for _ in range(MAX_THROTTLED_PROBES):
+            async with limiter:
+                async with session.head(url, allow_redirects=True) as resp:
+                    run_metrics.inc("requests_total", status=resp.status)
+                    if resp.status in (429, 503):
+                        limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                        run_metrics.inc("throttled_total")
+                        continue
+                    limiter.on_success()
+                    return resp.status
+        return None
+
+    # Teste les slugs candidats (HEAD) et renvoie le premier disponible, ou None.
+    # En cas d'erreur réseau ou de réponse inattendue, la résolution pourra être retentée au prochain run
+    async def resolve(
+            self,
+            drug_name: str,
+            url_for: Callable[[str], str],
+            session: aiohttp.ClientSession,
+            limiter: AdaptiveRateLimiter
+    ) -> str | None:
+        for slug in candidate_slugs(drug_name):
+            if slug == self.resolved.get(drug_name):
+                continue
+            try:
+                status = await self._probe(url_for(slug), session, limiter)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                logger.warning(f"Slug resolution interrupted for {drug_name}: {exc}")
+                return None
+            if status == 200:
+                self.resolved[drug_name] = slug
+                self.tried.discard(drug_name)
+                self._dirty = True
+                logger.success(f"Slug resolved for {drug_name}: {slug}")
+                return slug
+            if status != 404:
+                logger.warning(f"Slug resolution interrupted for {drug_name} (status {status}).")
+                return None
+        self.tried.add(drug_name)
+        self._dirty = True
+        logger.info(f"No slug found for {drug_name}.")
+        return None
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"resolved": self.resolved, "tried": sorted(self.tried)}, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
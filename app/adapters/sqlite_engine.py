@@ -0,0 +1,15 @@
+from sqlalchemy import Engine, create_engine, event
+
+
+def _set_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+# Moteur SQLite en mode WAL (lectures concurrentes, écritures journalisées)
+def create_sqlite_engine(db_path: str) -> Engine:
+    engine = create_engine(f"sqlite:///{db_path}")
+    event.listen(engine, "connect", _set_pragmas)
+    return engine
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import aiohttp
+from loguru import logger
+
+# Taille des blocs lus sur le flux HTTP et écrits sur le disque
+CHUNK_SIZE = 64 * 1024
+
+
+def _fsync_close(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _hash_file(path: str, sha256, length: int) -> None:
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            sha256.update(chunk)
+            remaining -= len(chunk)
+
+
+def _open_part(tmp_path: str, offset: int):
+    if not offset:
+        return open(tmp_path, "wb")
+    f = open(tmp_path, "r+b")
+    f.seek(offset)
+    f.truncate()
+    return f
+
+
+# Écriture en flux : les blocs sont écrits dans un fichier temporaire (hors boucle d'événements)
+# puis le fichier est renommé atomiquement en file_path une fois le téléchargement complet.
+# Avec offset > 0 (réponse 206), le corps reçu complète le fichier partiel existant ;
+# en cas d'erreur le fichier partiel est conservé pour une reprise ultérieure (requête Range).
+# part_suffix : suffixe du fichier partiel, propre à chaque écrivain quand plusieurs processus peuvent
+# télécharger le même fichier (crawl réparti), pour qu'ils n'écrivent jamais dans le même fichier partiel
+async def stream_to_file(
+        resp: aiohttp.ClientResponse,
+        file_path: str,
+        offset: int = 0,
+        part_suffix: str = ".part"
+) -> tuple[int, str]:
+    tmp_path = f"{file_path}{part_suffix}"
+    sha256 = hashlib.sha256()
+    if offset:
+        await asyncio.to_thread(_hash_file, tmp_path, sha256, offset)
+    received = 0
+    f = await asyncio.to_thread(_open_part, tmp_path, offset)
+    try:
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            sha256.update(chunk)
+            received += len(chunk)
+            await asyncio.to_thread(f.write, chunk)
+        if resp.content_length is not None and received != resp.content_length:
+            raise aiohttp.ClientPayloadError(
+                f"Incomplete body for {file_path}: {received}/{resp.content_length} bytes")
+        await asyncio.to_thread(_fsync_close, f)
+    except BaseException:
+        f.close()
+        raise
+    os.replace(tmp_path, file_path)
+    return offset + received, sha256.hexdigest()
+
+
+# Stockage des PDF sur le disque local (dossiers ema_*_rcp)
+class LocalStorage:
+
+    # part_suffix : voir stream_to_file (ex. ".<worker>.part" pour un worker du crawl réparti, qui ne reprend
+    # que ses propres fichiers partiels)
+    def __init__(self, part_suffix: str = ".part"):
+        self.part_suffix = part_suffix
+
+    # Contenu d'un dossier : {fichier: (taille, mtime)}, sans les téléchargements incomplets (.part)
+    def scan(self, dl_path: str) -> dict[str, tuple[int, float]]:
+        files: dict[str, tuple[int, float]] = {}
+        if os.path.isdir(dl_path):
+            with os.scandir(dl_path) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.endswith(".part"):
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def stat(self, file_path: str) -> tuple[int, float]:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+
+    async def write_stream(self, resp: aiohttp.ClientResponse, file_path: str, offset: int = 0) -> tuple[int, str]:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        return await stream_to_file(resp, file_path, offset, self.part_suffix)
+
+    # Taille du fichier partiel laissé par un téléchargement interrompu (0 s'il n'y en a pas)
+    def partial_size(self, file_path: str) -> int:
+        tmp_path = f"{file_path}{self.part_suffix}"
+        return os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+
+    def discard_partial(self, file_path: str) -> None:
+        tmp_path = f"{file_path}{self.part_suffix}"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def move(self, src_path: str, dst_path: str) -> None:
+        shutil.move(src_path, dst_path)
+
+    def delete(self, file_path: str) -> None:
+        os.remove(file_path)
+
+
+# Stockage des PDF dans un bucket S3 (clé = prefix + chemin local, ex. "rcp/ema_authorised_rcp/X.pdf").
+# Les réponses HTTP sont envoyées en flux par upload multipart (parties envoyées en parallèle pendant la
+# réception, sans fichier intermédiaire) ; l'inventaire est construit par listages paginés (1000 clés par
+# requête) au lieu d'un HEAD par objet. Pas de reprise Range : un téléchargement interrompu repart de zéro
+class S3Storage:
+
+    def __init__(
+            self,
+            bucket: str,
+            prefix: str = "",
+            client=None,
+            part_size: int = 8 * 1024 * 1024,
+            max_concurrency: int = 4,
+            endpoint_url: str | None = None
+    ):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        # S3 impose au moins 5 Mio par partie (sauf la dernière)
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.max_concurrency = max_concurrency
+
+    def key(self, file_path: str) -> str:
+        return self.prefix + os.path.normpath(file_path).replace(os.sep, "/")
+
+    def scan(self, dl_path: str) -> dict[str, tuple[int, float]]:
+        prefix = self.key(dl_path) + "/"
+        files: dict[str, tuple[int, float]] = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            for obj in page.get("Contents", []):
+                files[obj["Key"][len(prefix):]] = (obj["Size"], obj["LastModified"].timestamp())
+        return files
+
+    def stat(self, file_path: str) -> tuple[int, float]:
+        head = self.client.head_object(Bucket=self.bucket, Key=self.key(file_path))
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, data: bytes, slots: asyncio.Semaphore) -> dict:
+        try:
+            part = await asyncio.to_thread(
+                self.client.upload_part,
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data)
+            return {"PartNumber": number, "ETag": part["ETag"]}
+        finally:
+            slots.release()
+
+    async def write_stream(self, resp: aiohttp.ClientResponse, file_path: str, offset: int = 0) -> tuple[int, str]:
+        if offset:
+            raise ValueError("S3Storage cannot resume a partial upload")
+        key = self.key(file_path)
+        sha256 = hashlib.sha256()
+        buffer = bytearray()
+        received = 0
+        upload_id = None
+        tasks: list[asyncio.Task] = []
+        # Nombre de parties en mémoire / en cours d'envoi
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def flush_part() -> None:
+            nonlocal upload_id, buffer
+            if upload_id is None:
+                upload = await asyncio.to_thread(self.client.create_multipart_upload, Bucket=self.bucket, Key=key)
+                upload_id = upload["UploadId"]
+            await slots.acquire()
+            tasks.append(asyncio.create_task(
+                self._upload_part(key, upload_id, len(tasks) + 1, bytes(buffer), slots)))
+            buffer = bytearray()
+
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                sha256.update(chunk)
+                received += len(chunk)
+                buffer += chunk
+                if len(buffer) >= self.part_size:
+                    await flush_part()
+            if resp.content_length is not None and received != resp.content_length:
+                raise aiohttp.ClientPayloadError(
+                    f"Incomplete body for {file_path}: {received}/{resp.content_length} bytes")
+            if upload_id is None:
+                # Document plus petit qu'une partie : un seul PUT
+                await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=key, Body=bytes(buffer))
+            else:
+                if buffer:
+                    await flush_part()
+                parts = await asyncio.gather(*tasks)
+                await asyncio.to_thread(
+                    self.client.complete_multipart_upload,
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts})
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if upload_id is not None:
+                try:
+                    await asyncio.to_thread(
+                        self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id)
+                except Exception as exc:
+                    logger.warning(f"Could not abort multipart upload of {key}: {exc}")
+            raise
+        return received, sha256.hexdigest()
+
+    def partial_size(self, file_path: str) -> int:
+        return 0
+
+    def discard_partial(self, file_path: str) -> None:
+        pass
+
+    # Copie côté serveur puis suppression (aucune donnée ne transite par le client)
+    def move(self, src_path: str, dst_path: str) -> None:
+        self.client.copy({"Bucket": self.bucket, "Key": self.key(src_path)}, self.bucket, self.key(dst_path))
+        self.delete(src_path)
+
+    def delete(self, file_path: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(file_path))
+
+
+# Stockage désigné par une URL "s3://bucket/prefix" ; sans URL S3, disque local (dossier courant)
+def create_storage(
+        url: str | None = None,
+        endpoint_url: str | None = None,
+        part_suffix: str = ".part"
+) -> LocalStorage | S3Storage:
+    if url and url.startswith("s3://"):
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        return S3Storage(bucket, prefix, endpoint_url=endpoint_url)
+    return LocalStorage(part_suffix)
@@ -0,0 +1,166 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, delete, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from adapters.inventory import Inventory
+from adapters.sqlite_engine import create_sqlite_engine
+
+metadata = MetaData()
+
+documents_table = Table(
+    "documents",
+    metadata,
+    Column("file_path", String, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("language", String, nullable=False),
+    Column("revision", Integer),
+    Column("size", Integer),
+    Column("mtime", Float),  # taille et mtime du PDF indexé (détection des documents modifiés)
+    Column("nb_sections", Integer),
+    Column("indexed_at", Float),
+)
+
+# Index plein texte : une ligne par section du RCP (ex. "4.1 Therapeutic indications")
+SECTIONS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5("
+    "file_path UNINDEXED, name, status, language, revision UNINDEXED, section, content, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+# Titres numérotés des rubriques d'un RCP, en début de ligne (ex. "4.3 Contraindications")
+RE_SECTION_HEADING = re.compile(r"^\s*(\d{1,2}(?:\.\d{1,2})?)\.?\s+([A-Z][^\n]{2,100})$", re.MULTILINE)
+
+
+def split_sections(document_text: str) -> list[tuple[str, str]]:
+    matches = list(RE_SECTION_HEADING.finditer(document_text))
+    if not matches:
+        return [("", document_text.strip())]
+    sections = []
+    if matches[0].start() > 0 and document_text[:matches[0].start()].strip():
+        sections.append(("", document_text[:matches[0].start()].strip()))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = next_match.start() if next_match is not None else len(document_text)
+        content = document_text[match.end():end].strip()
+        if content:
+            sections.append((f"{match.group(1)} {match.group(2).strip()}", content))
+    return sections
+
+
+# Extraction du texte d'un PDF (exécutée dans un processus du pool) :
+# renvoie (file_path, sections, (taille, mtime) du fichier lu, erreur)
+def extract_sections(
+        file_path: str
+) -> tuple[str, list[tuple[str, str]] | None, tuple[int, float] | None, str | None]:
+    try:
+        from pypdf import PdfReader
+        stat = os.stat(file_path)
+        reader = PdfReader(file_path)
+        document_text = "\n".join(page.extract_text() or "" for page in reader.pages)
+        return file_path, split_sections(document_text), (stat.st_size, stat.st_mtime), None
+    except Exception as exc:
+        return file_path, None, None, str(exc)
+
+
+# Index plein texte incrémental (SQLite FTS5) des RCP téléchargés : seuls les PDF nouveaux ou modifiés depuis
+# le dernier run (taille ou mtime différents) sont extraits, en parallèle dans un pool de processus ;
+# les documents supprimés sont retirés de l'index
+class TextIndex:
+
+    def __init__(self, db_path: str = "rcp_text_index.db", max_workers: int | None = None):
+        self.engine = create_sqlite_engine(db_path)
+        self.max_workers = max_workers
+        metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(SECTIONS_FTS_DDL)
+
+    def _indexed(self, dl_path: str) -> dict[str, tuple[int, float]]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(documents_table.c.file_path, documents_table.c.size, documents_table.c.mtime)
+                .where(documents_table.c.file_path.startswith(f"{dl_path}/")))
+            return {row.file_path: (row.size, row.mtime) for row in rows}
+
+    def _remove(self, conn, file_paths: list[str]) -> None:
+        for file_path in file_paths:
+            conn.execute(text("DELETE FROM sections WHERE file_path = :file_path"), {"file_path": file_path})
+        conn.execute(delete(documents_table).where(documents_table.c.file_path.in_(file_paths)))
+
+    # Met à jour l'index pour un dossier (un statut, une langue). revisions : nom de fichier -> numéro de révision
+    def update(
+            self,
+            dl_path: str,
+            status: str,
+            language: str,
+            inventory: Inventory,
+            revisions: dict[str, int] | None = None
+    ) -> int:
+        revisions = revisions or {}
+        indexed = self._indexed(dl_path)
+        current: dict[str, tuple[int, float]] = {}
+        for name in inventory.names(dl_path):
+            stat = inventory.get(f"{dl_path}/{name}.pdf")
+            if stat is not None and not name.endswith("_old"):
+                current[f"{dl_path}/{name}.pdf"] = stat
+        to_extract = [path for path, stat in current.items() if indexed.get(path) != stat]
+        removed = [path for path in indexed if path not in current]
+
+        with self.engine.begin() as conn:
+            if removed:
+                self._remove(conn, removed)
+        if not to_extract:
+            logger.info(f"Text index: {dl_path} up to date ({len(removed)} documents removed).")
+            return 0
+
+        nb_indexed = 0
+        nb_failed = 0
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            results = pool.map(extract_sections, to_extract, chunksize=max(1, len(to_extract) // 64))
+            for file_path, sections, stat, error in results:
+                if sections is None or stat is None:
+                    # PDF illisible : enregistré sans section, avec la taille et le mtime de l'inventaire, pour
+                    # n'être réessayé que s'il est modifié
+                    logger.warning(f"Text extraction failed for {file_path}: {error}")
+                    sections, stat = [], current[file_path]
+                    nb_failed += 1
+                else:
+                    nb_indexed += 1
+                size, mtime = stat
+                name = file_path[len(dl_path) + 1:-len(".pdf")]
+                # Une transaction par document : l'index reste cohérent si le run est interrompu
+                with self.engine.begin() as conn:
+                    self._remove(conn, [file_path])
+                    if sections:
+                        conn.execute(
+                            text("INSERT INTO sections (file_path, name, status, language, revision, section, "
+                                 "content) VALUES (:file_path, :name, :status, :language, :revision, :section, "
+                                 ":content)"),
+                            [{"file_path": file_path, "name": name, "status": status, "language": language,
+                              "revision": revisions.get(name), "section": section, "content": content}
+                             for section, content in sections])
+                    conn.execute(sqlite_insert(documents_table).values(
+                        file_path=file_path, name=name, status=status, language=language,
+                        revision=revisions.get(name), size=size, mtime=mtime,
+                        nb_sections=len(sections), indexed_at=time.time()))
+        logger.info(f"Text index: {nb_indexed}/{len(to_extract)} documents of {dl_path} (re)indexed, "
+                    f"{nb_failed} unreadable, {len(removed)} removed.")
+        return nb_indexed
+
+    # Recherche plein texte (syntaxe FTS5), éventuellement limitée à une rubrique (ex. "contraindications")
+    def search(self, query: str, section: str | None = None, limit: int = 20) -> list[dict]:
+        sql = ("SELECT name, status, language, revision, section, "
+               "snippet(sections, 6, '[', ']', '…', 16) AS snippet "
+               "FROM sections WHERE sections MATCH :query")
+        params: dict = {"query": query, "limit": limit}
+        if section is not None:
+            sql += " AND section LIKE :section"
+            params["section"] = f"%{section}%"
+        sql += " ORDER BY rank LIMIT :limit"
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(text(sql), params)]
+
+    def close(self) -> None:
+        self.engine.dispose()
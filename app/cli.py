@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import date
+import config
+
+# Point d'entrée en ligne de commande. Les modules lourds (pandas, aiohttp, SQLAlchemy) ne sont importés que par
+# les commandes qui en ont besoin : "plan" n'utilise que la bibliothèque standard et répond immédiatement
+#   python app/cli.py plan [-v] [--json plan.json]   ce que ferait le prochain sync, sans requête ni écriture
+#   python app/cli.py sync                           run complet (équivalent de python app/main.py)
+#   python app/cli.py retry                          relance des téléchargements échoués uniquement
+#   python app/cli.py verify [--full]                vérification des PDF stockés
+
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    from core.paths import language_path, pdf_dirs
+    from core.plan import (compute_plan, read_manifest_paths, read_names, read_not_found, read_resumable,
+                           read_slug_tried, scan_dir)
+
+    start = time.perf_counter()
+    if not (os.path.exists(config.path_authorised_csv) and os.path.exists(config.path_withdrawn_csv)):
+        print("No cached index: the next sync is an initial crawl (every SmPC is downloaded).")
+        return 0
+    dl_paths = pdf_dirs(config.languages)
+    is_local = not (config.storage_url and config.storage_url.startswith("s3://"))
+    if is_local:
+        files = {dl_path: scan_dir(dl_path) for dl_path in dl_paths}
+    else:
+        # Bucket S3 : listage paginé (boto3), pas de blob store ni de reprise Range
+        from adapters.storage import create_storage
+        storage = create_storage(config.storage_url, config.s3_endpoint_url)
+        files = {dl_path: ({f[:-len(".pdf")] for f in storage.scan(dl_path) if f.endswith(".pdf")}, set())
+                 for dl_path in dl_paths}
+    not_found = {lang: read_not_found(language_path("failure_registry.db", lang)) for lang in config.languages}
+    plan = compute_plan(
+        config.languages,
+        read_names(config.path_authorised_csv),
+        read_names(config.path_withdrawn_csv),
+        files,
+        not_found,
+        read_slug_tried("slug_cache.json"),
+        store=is_local,
+        resumable=read_resumable("run_journal.db") if is_local else None,
+        manifest_paths=read_manifest_paths("manifest.json"),
+        revalidate_days=config.revalidate_days,
+        day=date.today().toordinal())
+    elapsed = time.perf_counter() - start
+
+    index_date = time.strftime("%Y-%m-%d %H:%M", time.localtime(os.path.getmtime(config.path_authorised_csv)))
+    print(f"Plan from the cached index of {index_date} (assuming the EMA index is unchanged):")
+    print(f"  {plan.summary()}")
+    print(f"  ~{plan.nb_requests()} HTTP requests, computed in {elapsed * 1000:.0f} ms")
+    if args.verbose:
+        for title, entries in (("download", plan.downloads), ("update", plan.updates), ("resume", plan.resumes),
+                               ("revalidate", plan.revalidations), ("skip (404)", plan.skipped_not_found)):
+            for dl_path, names in entries.items():
+                for name in names:
+                    print(f"{title:<11} {dl_path}/{name}.pdf")
+        for src_path, dst_path in plan.renames:
+            print(f"{'rename':<11} {src_path} -> {dst_path}")
+        for file_path in plan.deletions:
+            print(f"{'delete':<11} {file_path}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(plan.to_dict(), f, indent=1)
+    return 0
+
+
+def cmd_sync(args: argparse.Namespace) -> int:
+    from main import main
+    asyncio.run(main())
+    return 0
+
+
+def cmd_retry(args: argparse.Namespace) -> int:
+    from main import retry
+    if not asyncio.run(retry()):
+        print("No cached index: the next sync is an initial crawl (nothing to retry).")
+    return 0
+
+
+def cmd_verify(args: argparse.Namespace) -> int:
+    from main import verify
+    corrupt = verify(full=args.full)
+    if corrupt is None:
+        print("PDF verification skipped: only available for local storage (EMA_STORAGE_URL is an S3 bucket).")
+        return 0
+    for file_path, reason in sorted(corrupt.items()):
+        print(f"{file_path}: {reason}")
+    print(f"{len(corrupt)} corrupt PDF files removed (re-downloaded by the next sync).")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Download of the EMA SmPC PDF files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan = subparsers.add_parser("plan", help="show what the next sync would download, rename and delete")
+    plan.add_argument("-v", "--verbose", action="store_true", help="list every planned operation")
+    plan.add_argument("--json", metavar="PATH", help="write the full plan to a JSON file")
+    plan.set_defaults(func=cmd_plan)
+
+    sync = subparsers.add_parser("sync", help="full run: index, updates, downloads, status changes")
+    sync.set_defaults(func=cmd_sync)
+
+    retry = subparsers.add_parser("retry", help="retry the failed downloads only")
+    retry.set_defaults(func=cmd_retry)
+
+    verify = subparsers.add_parser("verify", help="check the stored PDF files")
+    verify.add_argument("--full", action="store_true", help="also re-check files verified by previous runs")
+    verify.set_defaults(func=cmd_verify)
+    return parser
+
+
+if __name__ == "__main__":
+    cli_args = build_parser().parse_args()
+    sys.exit(cli_args.func(cli_args))
@@ -0,0 +1,19 @@
+import os
+
+# Configuration commune aux points d'entrée (main.py, cli.py, crawl_shards.py).
+# Bibliothèque standard uniquement : importé par "cli.py plan", qui doit démarrer instantanément
+
+index_file_path: str = "index_file.xlsx"
+path_authorised_csv: str = "archives_authorised/simplified_file.csv"
+path_withdrawn_csv: str = "archives_withdrawn/simplified_file.csv"
+# Langues des RCP téléchargés (ex. EMA_LANGUAGES="en,fr,de") : index et noms traités une seule fois,
+# couples (médicament, langue) téléchargés ensemble ; dossiers et registres des échecs propres à chaque langue
+languages: list[str] = os.environ.get("EMA_LANGUAGES", "en").split(",")
+# Métriques au format texte Prometheus (node_exporter textfile collector)
+prometheus_path: str = "metrics/ema_rcp.prom"
+# Stockage des PDF : disque local par défaut, ou bucket S3 (ex. EMA_STORAGE_URL="s3://bucket/rcp",
+# EMA_S3_ENDPOINT_URL pour un service compatible S3)
+storage_url: str | None = os.environ.get("EMA_STORAGE_URL")
+s3_endpoint_url: str | None = os.environ.get("EMA_S3_ENDPOINT_URL")
+# Revérification des PDF déjà téléchargés (GET conditionnel) : chaque fichier tous les EMA_REVALIDATE_DAYS jours
+revalidate_days: int = int(os.environ.get("EMA_REVALIDATE_DAYS", "7"))
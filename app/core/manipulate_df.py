@@ -4,30 +4,43 @@ from loguru import logger
 from datetime import datetime
 import shutil
 import os
+import json
+
+
+# Motifs précompilés pour la normalisation des noms de médicaments
+RE_APOSTROPHES = re.compile(r"[’']")
+RE_IN_PARENTHESES = re.compile(r'\(in [^)]+\)')
+RE_PREVIOUSLY = re.compile(r'\(previously.*\)')
+RE_PARENTHESES = re.compile(r'[()]')
+RE_PUNCTUATION = re.compile(r"[,;:]")
+RE_SPACES = re.compile(r'\s+')
+RE_PREVIOUSLY_NAME = re.compile(r'\(previously ([^)]+)\)', re.IGNORECASE)
+WORDS_TO_REMOVE = {'a', 'the', 'of', 'and', 'in', 'on', 'for'}
+# Petits mots précédés d'un espace : le premier mot, mis en majuscule, n'est jamais concerné
+RE_WORDS_TO_REMOVE = re.compile(r" (?:%s)(?= |$)" % "|".join(sorted(WORDS_TO_REMOVE)))
 
 
 def clean_name_authorised(name: str) -> str:
-    # Remplacer les apostrophes typographiques par une apostrophe simple
-    name_edit_authorised = name.replace("’", "'").replace("'", "")
+    # Supprimer les apostrophes (typographiques et simples)
+    name_edit_authorised = RE_APOSTROPHES.sub('', name)
     # Supprimer toute la partie entre parenthèses commençant par "in"
-    name_edit_authorised = re.sub(r'\(in [^)]+\)', '', name_edit_authorised)
+    name_edit_authorised = RE_IN_PARENTHESES.sub('', name_edit_authorised)
     # Supprimer toute la partie (previously ...)
-    name_edit_authorised = re.sub(r'\(previously.*\)', '', name_edit_authorised)
+    name_edit_authorised = RE_PREVIOUSLY.sub('', name_edit_authorised)
     # Supprimer toutes les parenthèses restantes mais garder leur contenu
-    name_edit_authorised = re.sub(r'[()]', '', name_edit_authorised)
+    name_edit_authorised = RE_PARENTHESES.sub('', name_edit_authorised)
     # Remplacer "/" par espace
     name_edit_authorised = name_edit_authorised.replace("/", " ")
     # Supprimer les points
     name_edit_authorised = name_edit_authorised.replace(".", "")
     # Remplacer les virgules, deux-points, points-virgules par des espaces
-    name_edit_authorised = re.sub(r"[,;:]", " ", name_edit_authorised)
+    name_edit_authorised = RE_PUNCTUATION.sub(" ", name_edit_authorised)
     # Remplacer plusieurs espaces par un seul espace
-    name_edit_authorised = re.sub(r'\s+', ' ', name_edit_authorised).strip()
+    name_edit_authorised = RE_SPACES.sub(' ', name_edit_authorised).strip()
     # Mettre en majuscule la première lettre de chaque mot
     name_edit_authorised = name_edit_authorised.capitalize()
     # Découper en mots et filtrer petits mots inutiles (optionnel)
-    words_to_remove = {'a', 'the', 'of', 'and', 'in', 'on', 'for'}
-    words = [w for w in name_edit_authorised.split() if w not in words_to_remove]
+    words = [w for w in name_edit_authorised.split() if w not in WORDS_TO_REMOVE]
     # Remettre en forme avec des tirets
     name_edit_authorised = '-'.join(words)
     return name_edit_authorised
@@ -35,35 +48,13 @@ def clean_name_authorised(name: str) -> str:
 
 def clean_name_withdrawn(name: str,
                          name_edit_authorised: str) -> str:
-    # Remplacer les apostrophes typographiques par une apostrophe simple
-    name_edit_withdrawn = name.replace("’", "'").replace("'", "")
-    # Supprimer toute la partie entre parenthèses commençant par "in"
-    name_edit_withdrawn = re.sub(r'\(in [^)]+\)', '', name_edit_withdrawn)
-    # Supprimer toute la partie (previously ...)
-    name_edit_withdrawn = re.sub(r'\(previously.*\)', '', name_edit_withdrawn)
-    # Supprimer toutes les parenthèses restantes mais garder leur contenu
-    name_edit_withdrawn = re.sub(r'[()]', '', name_edit_withdrawn)
-    # Remplacer "/" par espace
-    name_edit_withdrawn = name_edit_withdrawn.replace("/", " ")
-    # Supprimer les points
-    name_edit_withdrawn = name_edit_withdrawn.replace(".", "")
-    # Remplacer les virgules, deux-points, points-virgules par des espaces
-    name_edit_withdrawn = re.sub(r"[,;:]", " ", name_edit_withdrawn)
-    # Remplacer plusieurs espaces par un seul espace
-    name_edit_withdrawn = re.sub(r'\s+', ' ', name_edit_withdrawn).strip()
-    # Mettre en majuscule la première lettre de chaque mot
-    name_edit_withdrawn = name_edit_withdrawn.capitalize()
-    # Découper en mots et filtrer petits mots inutiles (optionnel)
-    words_to_remove = {'a', 'the', 'of', 'and', 'in', 'on', 'for'}
-    words = [w for w in name_edit_withdrawn.split() if w not in words_to_remove]
-    # Remettre en forme avec des tirets
-    name_edit_withdrawn = '-'.join(words)
+    name_edit_withdrawn = clean_name_authorised(name)
 
     # Si le nom est identique à l'authorised
     if name_edit_withdrawn == name_edit_authorised:
         logger.warning(f"The name {name_edit_withdrawn} is identical for both authorised and withdrawn medicines.")
         # Chercher la partie (previously ...)
-        match = re.search(r'\(previously ([^)]+)\)', name, re.IGNORECASE)
+        match = RE_PREVIOUSLY_NAME.search(name)
         if match:
             previously = match.group(1)
             # Nettoyer et formater la partie previously
@@ -72,13 +63,71 @@ def clean_name_withdrawn(name: str,
         else:
             name_edit_withdrawn += "-0"
     return name_edit_withdrawn
-    
+
+
+# Version vectorisée de clean_name_authorised (opérations pandas .str, mêmes étapes)
+def clean_names_authorised(names: pd.Series) -> pd.Series:
+    names = names.str.replace(RE_APOSTROPHES, '', regex=True)
+    names = names.str.replace(RE_IN_PARENTHESES, '', regex=True)
+    names = names.str.replace(RE_PREVIOUSLY, '', regex=True)
+    names = names.str.replace(RE_PARENTHESES, '', regex=True)
+    names = names.str.replace("/", " ", regex=False)
+    names = names.str.replace(".", "", regex=False)
+    names = names.str.replace(RE_PUNCTUATION, " ", regex=True)
+    names = names.str.replace(RE_SPACES, ' ', regex=True).str.strip()
+    # str.capitalize de Python (le .str.capitalize d'Arrow diffère sur certains caractères Unicode)
+    names = names.map(str.capitalize, na_action="ignore")
+    names = names.str.replace(RE_WORDS_TO_REMOVE, '', regex=True)
+    return names.str.replace(" ", "-", regex=False)
+
+
+# Version vectorisée de clean_name_withdrawn : suffixe "previously" ou "-0" en cas de collision
+def clean_names_withdrawn(
+        names: pd.Series,
+        names_clean: pd.Series,
+        authorised_names_clean: set | None
+) -> pd.Series:
+    # Un nom absent des authorised est comparé à "" (comportement de clean_name_withdrawn)
+    collides = names_clean.isin(authorised_names_clean or set()) | (names_clean == "")
+    if not collides.any():
+        return names_clean
+    for name in names_clean[collides]:
+        logger.warning(f"The name {name} is identical for both authorised and withdrawn medicines.")
+    previously = names[collides].str.extract(RE_PREVIOUSLY_NAME, expand=False)
+    suffix = previously.str.split().str.join("-").str.lower().fillna("0")
+    names_clean = names_clean.copy()
+    names_clean[collides] = names_clean[collides] + "-" + suffix
+    return names_clean
+
+
+# Cache persistant nom brut -> nom nettoyé : seuls les noms nouveaux ou modifiés
+# depuis le dernier index sont normalisés
+def normalize_names(names: pd.Series, name_cache_path: str | None = None) -> pd.Series:
+    cache: dict[str, str] = {}
+    if name_cache_path and os.path.exists(name_cache_path):
+        with open(name_cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+
+    unique_names = pd.Series(names.dropna().unique())
+    new_names = unique_names[~unique_names.isin(cache.keys())]
+    if not new_names.empty:
+        cache.update(zip(new_names, clean_names_authorised(new_names)))
+        logger.info(f"{len(new_names)} new medicine names normalized.")
+        if name_cache_path:
+            tmp_path = f"{name_cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, name_cache_path)
+    return names.map(cache)
+
+
 # Fonction pour simplifier le DataFrame
 def simplify_dataframe(
     df: pd.DataFrame,
     path_csv: str,
     path_json: str,
-    authorised_names_clean: set = None
+    authorised_names_clean: set = None,
+    name_cache_path: str | None = "name_cache.json"
 ) -> pd.DataFrame:
 
     try:
@@ -102,16 +151,13 @@ def simplify_dataframe(
 
         # Correction du nom
         if df_light["Status"].iloc[0] == "Authorised":
-            df_light["Name"] = df_light["Name"].apply(clean_name_authorised)
+            df_light["Name"] = normalize_names(df_light["Name"], name_cache_path)
             logger.success("Successfully simplified the Excel file for authorised medicines.")
             df_light.to_json(path_json, orient="records")
         else:
             # On suppose que authorised_names_clean est passé en argument
-            def clean_withdrawn_row(name):
-                name_clean = clean_name_authorised(name)
-                name_edit_authorised = name_clean if authorised_names_clean and name_clean in authorised_names_clean else ""
-                return clean_name_withdrawn(name, name_edit_authorised)
-            df_light["Name"] = df_light["Name"].apply(clean_withdrawn_row)
+            names_clean = normalize_names(df_light["Name"], name_cache_path)
+            df_light["Name"] = clean_names_withdrawn(df_light["Name"], names_clean, authorised_names_clean)
             df_light.to_json(path_json, orient="records")
             logger.success("Successfully simplified the Excel file for withdrawn medicines.")
 
@@ -0,0 +1,21 @@
+import os
+
+# Langue historique : ses fichiers gardent les chemins sans suffixe de langue
+DEFAULT_LANGUAGE = "en"
+
+
+# Chemin propre à une langue : inchangé pour l'anglais, suffixé sinon
+# (ex. ema_authorised_rcp -> ema_authorised_rcp_fr, failed_urls_authorised.csv -> failed_urls_authorised_fr.csv)
+def language_path(path: str, language: str) -> str:
+    if language == DEFAULT_LANGUAGE:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{language}{ext}"
+
+
+# Dossiers des PDF, un par statut (suffixés par langue comme les autres chemins)
+PDF_DIRS = ("ema_authorised_rcp", "ema_withdrawn_rcp")
+
+
+def pdf_dirs(languages) -> list[str]:
+    return [language_path(dl_path, lang) for lang in languages for dl_path in PDF_DIRS]
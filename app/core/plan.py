@@ -0,0 +1,168 @@
+import csv
+import json
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from core.paths import language_path
+from core.revalidation import revalidation_names
+
+# Ce module n'importe que la bibliothèque standard : "cli.py plan" doit répondre en moins d'une seconde
+
+
+# Opérations qu'effectuerait le prochain "sync" si l'index de l'EMA n'a pas changé depuis le dernier
+# téléchargement (index simplifié en cache comparé à l'inventaire des dossiers)
+@dataclass
+class RunPlan:
+    downloads: dict[str, list[str]] = field(default_factory=dict)  # dossier -> médicaments à télécharger
+    updates: dict[str, list[str]] = field(default_factory=dict)  # dossier -> nouvelle version (ancienne en _old)
+    resumes: dict[str, list[str]] = field(default_factory=dict)  # dossier -> reprises Range (fichier .part)
+    revalidations: dict[str, list[str]] = field(default_factory=dict)  # dossier -> GET conditionnels du jour
+    renames: list[tuple[str, str]] = field(default_factory=list)  # (source, destination)
+    deletions: list[str] = field(default_factory=list)
+    skipped_not_found: dict[str, list[str]] = field(default_factory=dict)
+
+    def nb_requests(self) -> int:
+        # + 1 : GET conditionnel de l'index
+        return (1 + sum(len(v) for v in self.downloads.values()) + sum(len(v) for v in self.updates.values())
+                + sum(len(v) for v in self.revalidations.values()))
+
+    def summary(self) -> str:
+        return (f"{sum(len(v) for v in self.downloads.values())} downloads "
+                f"({sum(len(v) for v in self.resumes.values())} resumed), "
+                f"{sum(len(v) for v in self.updates.values())} updates, "
+                f"{sum(len(v) for v in self.revalidations.values())} revalidations, {len(self.renames)} renames, "
+                f"{len(self.deletions)} deletions, "
+                f"{sum(len(v) for v in self.skipped_not_found.values())} known 404s skipped")
+
+    def to_dict(self) -> dict:
+        return {
+            "downloads": self.downloads,
+            "updates": self.updates,
+            "resumes": self.resumes,
+            "revalidations": self.revalidations,
+            "renames": self.renames,
+            "deletions": self.deletions,
+            "skipped_not_found": self.skipped_not_found,
+        }
+
+
+def read_names(path_csv: str) -> list[str]:
+    with open(path_csv, newline="", encoding="utf-8") as f:
+        return [row["Name"] for row in csv.DictReader(f)]
+
+
+# Contenu d'un dossier de PDF : (noms des PDF sans .pdf, noms des téléchargements incomplets .part)
+def scan_dir(dl_path: str) -> tuple[set[str], set[str]]:
+    names: set[str] = set()
+    partial: set[str] = set()
+    if os.path.isdir(dl_path):
+        with os.scandir(dl_path) as it:
+            for entry in it:
+                if entry.name.endswith(".pdf.part"):
+                    partial.add(entry.name[:-len(".pdf.part")])
+                elif entry.name.endswith(".pdf"):
+                    names.add(entry.name[:-len(".pdf")])
+    return names, partial
+
+
+# Médicaments notés 404 dans un registre des échecs (lecture seule : le plan ne crée ni ne modifie aucune base)
+def read_not_found(db_path: str) -> set[str]:
+    if not os.path.exists(db_path):
+        return set()
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return {name for (name,) in conn.execute("SELECT name FROM failures WHERE kind = 'not_found'")}
+    finally:
+        conn.close()
+
+
+# Téléchargements interrompus reprenables (Range + If-Range) d'après le journal du run : file_path des
+# téléchargements en cours ou échoués dont l'ETag a été reçu
+def read_resumable(db_path: str) -> set[str]:
+    if not os.path.exists(db_path):
+        return set()
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return {file_path for (file_path,) in conn.execute(
+            "SELECT file_path FROM jobs WHERE state IN ('in_flight', 'failed') AND etag IS NOT NULL")}
+    finally:
+        conn.close()
+
+
+# Fichiers connus du manifest (ETag / Last-Modified enregistrés) : seuls ceux-ci sont revérifiés
+def read_manifest_paths(manifest_path: str) -> set[str]:
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return set(json.load(f))
+
+
+# Médicaments dont le slug a déjà été recherché (slug_cache.json) : un 404 connu n'est alors plus retenté
+def read_slug_tried(cache_path: str) -> set[str]:
+    if not os.path.exists(cache_path):
+        return set()
+    with open(cache_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return set(data.get("tried", [])) | set(data.get("resolved", {}))
+
+
+# Mêmes règles que main.py avec un index inchangé : fichiers manquants, mises à jour laissées en _old,
+# médicaments de la liste withdrawn dont la copie authorised est encore présente, revérifications du jour
+def compute_plan(
+        languages: list[str],
+        authorised_names: list[str],
+        withdrawn_names: list[str],
+        files: dict[str, tuple[set[str], set[str]]],
+        not_found: dict[str, set[str]],
+        slug_tried: set[str],
+        store: bool,
+        resumable: set[str] | None = None,
+        manifest_paths: set[str] | None = None,
+        revalidate_days: int = 7,
+        day: int = 0
+) -> RunPlan:
+    resumable = resumable or set()
+    manifest_paths = manifest_paths or set()
+    plan = RunPlan()
+    for lang in languages:
+        dl_path_authorised = language_path("ema_authorised_rcp", lang)
+        dl_path_withdrawn = language_path("ema_withdrawn_rcp", lang)
+        authorised_files, authorised_partial = files[dl_path_authorised]
+        withdrawn_files, withdrawn_partial = files[dl_path_withdrawn]
+
+        def skipped(name: str) -> bool:
+            return name in not_found[lang] and name in slug_tried
+
+        def download(dl_path: str, name: str, partial: set[str]) -> bool:
+            if skipped(name):
+                plan.skipped_not_found.setdefault(dl_path, []).append(name)
+                return False
+            plan.downloads.setdefault(dl_path, []).append(name)
+            if name in partial and f"{dl_path}/{name}.pdf" in resumable:
+                plan.resumes.setdefault(dl_path, []).append(name)
+            return True
+
+        for name in sorted(set(authorised_names)):
+            if f"{name}_old" in authorised_files and not store:
+                plan.updates.setdefault(dl_path_authorised, []).append(name)
+                plan.deletions.append(f"{dl_path_authorised}/{name}_old.pdf")
+            elif name not in authorised_files:
+                download(dl_path_authorised, name, authorised_partial)
+
+        for name in sorted(set(withdrawn_names)):
+            file_path_authorised = f"{dl_path_authorised}/{name}.pdf"
+            if name in withdrawn_files:
+                if name in authorised_files:
+                    plan.deletions.append(file_path_authorised)
+            elif name in authorised_files and store:
+                plan.renames.append((file_path_authorised, f"{dl_path_withdrawn}/{name}.pdf"))
+            elif download(dl_path_withdrawn, name, withdrawn_partial) and name in authorised_files:
+                plan.deletions.append(file_path_authorised)
+
+        for names, dl_path, present in ((authorised_names, dl_path_authorised, authorised_files),
+                                        (withdrawn_names, dl_path_withdrawn, withdrawn_files)):
+            planned = set(plan.updates.get(dl_path, [])) | set(plan.downloads.get(dl_path, []))
+            due = revalidation_names(names, dl_path, present - planned, manifest_paths, revalidate_days, day)
+            if due:
+                plan.revalidations[dl_path] = sorted(due)
+    return plan
@@ -0,0 +1,22 @@
+import hashlib
+
+# Bibliothèque standard uniquement (utilisé par main.py et par "cli.py plan")
+
+
+# Jour de la rotation où un fichier est revérifié : hash stable du chemin, chaque fichier revient tous les
+# nb_days jours et la charge est répartie uniformément sur les jours
+def revalidation_day(file_path: str, nb_days: int) -> int:
+    digest = hashlib.blake2b(file_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % nb_days
+
+
+# Médicaments d'un dossier à revérifier (GET conditionnel) aujourd'hui : fichiers présents et connus du
+# manifest (ETag / Last-Modified) dont c'est le jour de rotation. day : numéro du jour (date.toordinal()) ;
+# nb_days=1 : tous les fichiers
+def revalidation_names(names, dl_path: str, present: set[str], manifest_paths, nb_days: int, day: int) -> set[str]:
+    due: set[str] = set()
+    for name in names:
+        file_path = f"{dl_path}/{name}.pdf"
+        if name in present and file_path in manifest_paths and revalidation_day(file_path, nb_days) == day % nb_days:
+            due.add(name)
+    return due
@@ -0,0 +1,77 @@
+import os
+from dataclasses import dataclass, field
+import pandas as pd
+from loguru import logger
+
+
+# Ensemble des changements entre deux index simplifiés (noms nettoyés)
+@dataclass(frozen=True)
+class ChangeSet:
+    added: frozenset[str] = field(default_factory=frozenset)
+    removed: frozenset[str] = field(default_factory=frozenset)
+    revision_bumped: frozenset[str] = field(default_factory=frozenset)
+    moved_to_withdrawn: frozenset[str] = field(default_factory=frozenset)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.revision_bumped or self.moved_to_withdrawn)
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.removed)} removed, "
+                f"{len(self.revision_bumped)} revision bumped, "
+                f"{len(self.moved_to_withdrawn)} moved to withdrawn")
+
+
+# Compare l'index du jour à celui de la veille en une seule jointure
+def compute_change_set(
+        df_today: pd.DataFrame,
+        df_yesterday: pd.DataFrame,
+        df_withdrawn_today: pd.DataFrame | None = None
+) -> ChangeSet:
+    # Un nom en double ne correspond qu'à un seul fichier : on garde la dernière ligne
+    today = df_today.loc[:, ["Name", "Revision_nb"]].drop_duplicates("Name", keep="last")
+    yesterday = df_yesterday.loc[:, ["Name", "Revision_nb"]].drop_duplicates("Name", keep="last")
+
+    merged = today.merge(
+        yesterday,
+        on="Name",
+        how="outer",
+        suffixes=("_today", "_yesterday"),
+        indicator=True)
+
+    added = merged.loc[merged["_merge"] == "left_only", "Name"]
+    gone = merged.loc[merged["_merge"] == "right_only", "Name"]
+    both = merged[merged["_merge"] == "both"]
+    bumped = both.loc[both["Revision_nb_today"] != both["Revision_nb_yesterday"], "Name"]
+
+    if df_withdrawn_today is not None:
+        is_moved = gone.isin(df_withdrawn_today["Name"])
+    else:
+        is_moved = pd.Series(False, index=gone.index)
+
+    return ChangeSet(
+        added=frozenset(added),
+        removed=frozenset(gone[~is_moved]),
+        revision_bumped=frozenset(bumped),
+        moved_to_withdrawn=frozenset(gone[is_moved]),
+    )
+
+
+# Charge les fichiers simplifiés archivés et calcule le ChangeSet (None si pas de fichier de la veille)
+def load_change_set(
+        df_today_path: str,
+        df_yesterday_path: str | None,
+        df_withdrawn_today_path: str | None = None
+) -> ChangeSet | None:
+    if not df_yesterday_path or not os.path.exists(df_yesterday_path):
+        logger.error("No file from the previous day found, nothing to compare.")
+        return None
+
+    df_today = pd.read_csv(df_today_path)
+    df_yesterday = pd.read_csv(df_yesterday_path)
+    df_withdrawn_today = None
+    if df_withdrawn_today_path and os.path.exists(df_withdrawn_today_path):
+        df_withdrawn_today = pd.read_csv(df_withdrawn_today_path)
+
+    changes = compute_change_set(df_today, df_yesterday, df_withdrawn_today)
+    logger.info(f"Changes in {df_today_path}: {changes.summary()}.")
+    return changes
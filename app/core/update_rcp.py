@@ -1,9 +1,16 @@
 import pandas as pd
-import os
-import shutil
 import asyncio
 import aiohttp
-from adapters.download_file import download_pdf, retry_failed_downloads
+from adapters.download_file import download_pdf, retry_failed_downloads, language_path, DEFAULT_LANGUAGE
+from adapters.manifest import Manifest
+from adapters.failure_registry import FailureRegistry
+from adapters.rate_limiter import AdaptiveRateLimiter
+from adapters.http_session import use_session
+from adapters.inventory import Inventory
+from adapters.run_journal import RunJournal
+from adapters.slug_resolver import SlugResolver
+from adapters.blob_store import BlobStore
+from core.revision_diff import ChangeSet, load_change_set
 from loguru import logger
 from datetime import datetime
 
@@ -13,46 +20,93 @@ today = datetime.now().strftime('%d-%m-%Y')
 # Fonction pour renommer les fichiers RCP mis à jour
 def rename_update_rcp(
         df_authorised_today_path: str = "archives_authorised/simplified_file.csv",
-        df_authorised_yesterday_path: str = f"archives_authorised/simplified_file.csv_{today}.csv"
-):
-    if not df_authorised_yesterday_path or not os.path.exists(df_authorised_yesterday_path):
-        logger.error("No file from the previous day found, nothing to compare.")
-        return None
-
-    df_today = pd.read_csv(df_authorised_today_path).set_index("Name")
-    df_yesterday = pd.read_csv(df_authorised_yesterday_path).set_index("Name")
-
-    for drug_name in df_today.index:
-        if drug_name in df_yesterday.index:
-            rev_today = df_today.loc[drug_name, "Revision_nb"]
-            rev_yesterday = df_yesterday.loc[drug_name, "Revision_nb"]
-            if rev_today != rev_yesterday:
-                file_path = f"ema_authorised_rcp/{drug_name}.pdf"
-                file_old_path = f"ema_authorised_rcp/{drug_name}_old.pdf"
-                if os.path.exists(file_path):
-                    shutil.move(file_path, file_old_path)
-                    logger.info(f"The file {drug_name}.pdf has been renamed to {drug_name}_old.pdf due to an update.")
+        df_authorised_yesterday_path: str = f"archives_authorised/simplified_file.csv_{today}.csv",
+        df_withdrawn_today_path: str | None = "archives_withdrawn/simplified_file.csv",
+        inventory: Inventory | None = None,
+        dl_paths: list[str] | None = None,
+        store: BlobStore | None = None
+) -> ChangeSet | None:
+    changes = load_change_set(df_authorised_today_path, df_authorised_yesterday_path, df_withdrawn_today_path)
+    # Avec le blob store, la version courante reste en place (revalidée par update_rcp) : aucun renommage
+    if changes is None or store is not None:
+        return changes
+    # Un dossier par langue téléchargée (voir language_path)
+    if dl_paths is None:
+        dl_paths = ["ema_authorised_rcp"]
+    if inventory is None:
+        inventory = Inventory(dl_paths)
+
+    for dl_path in dl_paths:
+        for drug_name in changes.revision_bumped:
+            file_path = f"{dl_path}/{drug_name}.pdf"
+            file_old_path = f"{dl_path}/{drug_name}_old.pdf"
+            if inventory.exists(file_path):
+                inventory.storage.move(file_path, file_old_path)
+                inventory.move(file_path, file_old_path)
+                logger.info(f"The file {file_path} has been renamed to {drug_name}_old.pdf due to an update.")
+    return changes
+
+
+# Médicaments dont le RCP doit être retéléchargé : nouvelle révision (GET conditionnel sur la version courante)
+# avec le blob store ; sinon ancienne version renommée en _old par rename_update_rcp, y compris par un run
+# interrompu avant la fin de la mise à jour
+def update_names(
+        df_today: pd.DataFrame,
+        dl_path: str,
+        changes: ChangeSet | None,
+        inventory: Inventory,
+        store: BlobStore | None = None
+) -> list[str]:
+    if store is not None:
+        if changes is None:
+            return []
+        df_today = df_today[df_today["Name"].isin(changes.revision_bumped)]
+        return [name for name in df_today["Name"] if inventory.exists(f"{dl_path}/{name}.pdf")]
+    return [name for name in df_today["Name"] if inventory.exists(f"{dl_path}/{name}_old.pdf")]
+
+
+# Supprime l'ancienne version (_old) une fois la nouvelle téléchargée
+def remove_old_version(drug_name: str, dl_path: str, inventory: Inventory) -> None:
+    file_path = f"{dl_path}/{drug_name}.pdf"
+    file_old_path = f"{dl_path}/{drug_name}_old.pdf"
+    if inventory.exists(file_path) and inventory.exists(file_old_path):
+        inventory.storage.delete(file_old_path)
+        inventory.remove(file_old_path)
+        logger.info(f"Old RCP file deleted for {drug_name} (new version downloaded successfully).")
 
 
 async def update_rcp(
         df_today: pd.DataFrame,
+        registry: FailureRegistry,
         language: str = "en",
         nb_workers: int = 5,
-        failed_urls_file: str = "failed_urls_authorised.csv",
         dl_path: str = "ema_authorised_rcp",
-        status: str = "authorised"
+        status: str = "authorised",
+        manifest: Manifest | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+        session: aiohttp.ClientSession | None = None,
+        changes: ChangeSet | None = None,
+        inventory: Inventory | None = None,
+        journal: RunJournal | None = None,
+        resolver: SlugResolver | None = None,
+        store: BlobStore | None = None
 ) -> int:
 
-    sem = asyncio.Semaphore(nb_workers)
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(initial_concurrency=nb_workers)
+    if inventory is None:
+        inventory = Inventory([dl_path])
     nb_updates = 0
+    # Avec un ChangeSet, seuls les médicaments dont la révision a changé sont examinés
+    if changes is not None:
+        df_today = df_today[df_today["Name"].isin(changes.revision_bumped)]
+    to_update = set(update_names(df_today, dl_path, changes, inventory, store))
 
-    async with aiohttp.ClientSession() as session:
+    async with use_session(session) as session:
         tasks = []
-        for drug_name in df_today["Name"]:
-            file_old_path = f"{dl_path}/{drug_name}_old.pdf"
-            file_path = f"{dl_path}/{drug_name}.pdf"
-            if os.path.exists(file_old_path):
-                row = df_today[df_today["Name"] == drug_name].iloc[0]
+        for row in df_today.itertuples():
+            drug_name = row.Name
+            if drug_name in to_update:
                 tasks.append(
                     download_pdf(
                         language,
@@ -61,40 +115,81 @@ async def update_rcp(
                         len(df_today),
                         dl_path,
                         session,
-                        sem,
-                        failed_urls_file,
-                        status
+                        limiter,
+                        registry,
+                        status,
+                        manifest,
+                        revalidate=store is not None,
+                        inventory=inventory,
+                        journal=journal,
+                        resolver=resolver,
+                        store=store
                     )
                 )
                 nb_updates += 1
                 logger.info(f"Update #{nb_updates} : RCP for {drug_name} added to the download list.")
         await asyncio.gather(*tasks)
+        if manifest is not None:
+            manifest.save()
 
-    while await retry_failed_downloads(failed_urls_file,
-                                       dl_path,
-                                       status,
-                                       language,
-                                       nb_workers,
-                                       "not_found_urls.csv"):
-        logger.info("Retrying download of failed files.")
+        while await retry_failed_downloads(registry,
+                                           dl_path,
+                                           status,
+                                           language,
+                                           nb_workers,
+                                           manifest,
+                                           limiter,
+                                           session,
+                                           inventory,
+                                           journal,
+                                           resolver,
+                                           store):
+            logger.info("Retrying download of failed files.")
 
     for drug_name in df_today["Name"]:
-        file_path = f"{dl_path}/{drug_name}.pdf"
-        file_old_path = f"{dl_path}/{drug_name}_old.pdf"
-
-        if os.path.exists(file_path) and os.path.exists(file_old_path):
-            os.remove(file_old_path)
-            logger.info(f"Old RCP file deleted for {drug_name} (new version downloaded successfully).")
+        remove_old_version(drug_name, dl_path, inventory)
 
     if nb_updates == 0:
         logger.info("No RCP update was performed.")
     return nb_updates
 
-def change_status(df_today : pd.DataFrame) -> None:
-    
-    for drug_name in df_today["Name"]:
-        file_path_authorised = f"ema_authorised_rcp/{drug_name}.pdf"
-        file_path_withdrawn = f"ema_withdrawn_rcp/{drug_name}.pdf"
-        if os.path.exists (file_path_authorised) and os.path.exists(file_path_withdrawn):
-            os.remove(file_path_authorised)
-            logger.info(f"Removed {file_path_authorised} because {drug_name} is now withdrawn.")
\ No newline at end of file
+# Changement de statut d'un médicament : copie authorised supprimée si la copie withdrawn existe ;
+# avec le blob store, un médicament passé withdrawn (moved=True) voit sa vue déplacée vers le dossier withdrawn
+def apply_status_change(
+        drug_name: str,
+        manifest: Manifest | None,
+        inventory: Inventory,
+        language: str = DEFAULT_LANGUAGE,
+        store: BlobStore | None = None,
+        moved: bool = False
+) -> None:
+    file_path_authorised = f"{language_path('ema_authorised_rcp', language)}/{drug_name}.pdf"
+    file_path_withdrawn = f"{language_path('ema_withdrawn_rcp', language)}/{drug_name}.pdf"
+    if inventory.exists(file_path_authorised) and inventory.exists(file_path_withdrawn):
+        inventory.storage.delete(file_path_authorised)
+        inventory.remove(file_path_authorised)
+        if manifest is not None:
+            manifest.remove(file_path_authorised)
+        logger.info(f"Removed {file_path_authorised} because {drug_name} is now withdrawn.")
+    elif store is not None and moved and inventory.exists(file_path_authorised):
+        # Passage à withdrawn : la vue change de dossier, le document n'est ni copié ni retéléchargé
+        store.move_view(file_path_authorised, file_path_withdrawn, drug_name, language, "Withdrawn")
+        inventory.move(file_path_authorised, file_path_withdrawn)
+        if manifest is not None:
+            manifest.move(file_path_authorised, file_path_withdrawn)
+
+
+def change_status(
+        df_today : pd.DataFrame,
+        manifest: Manifest | None = None,
+        names: frozenset[str] | None = None,
+        inventory: Inventory | None = None,
+        language: str = DEFAULT_LANGUAGE,
+        store: BlobStore | None = None
+) -> None:
+    if inventory is None:
+        inventory = Inventory([language_path("ema_authorised_rcp", language), language_path("ema_withdrawn_rcp", language)])
+    # Avec un ChangeSet, seuls les médicaments passés de authorised à withdrawn sont examinés
+    drug_names = df_today["Name"] if names is None else df_today["Name"][df_today["Name"].isin(names)]
+    for drug_name in drug_names:
+        apply_status_change(drug_name, manifest, inventory, language, store, moved=names is not None)
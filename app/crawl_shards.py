@@ -0,0 +1,232 @@
+from loguru import logger
+from datetime import datetime
+import argparse
+import asyncio
+import glob
+import multiprocessing
+import os
+import socket
+import sys
+import pandas as pd
+from adapters.download_file import download_index, download_files_languages, language_path, url_index_file
+from core.manipulate_df import simplify_dataframe
+from adapters.manifest import Manifest
+from adapters.failure_registry import FailureRegistry, FAILED, NOT_FOUND
+from adapters.rate_limiter import SharedRateBudget
+from adapters.http_session import create_session
+from adapters.run_journal import RunJournal
+from adapters.metrics import run_metrics
+from adapters.blob_store import BlobStore
+from adapters.storage import create_storage, LocalStorage
+from adapters.shard_coordinator import LeaseTable, shard_names
+from run_state import open_run_state
+from config import index_file_path, path_authorised_csv, path_withdrawn_csv, languages, storage_url, s3_endpoint_url
+
+# Fichiers partagés par tous les workers (disque commun si les workers sont sur plusieurs machines)
+lease_db_path: str = "crawl_leases.db"
+budget_db_path: str = "rate_budget.db"
+
+
+def worker_manifest_path(worker_id: str) -> str:
+    return f"manifest.{worker_id}.json"
+
+
+# Index des médicaments et fichiers simplifiés, préparés une seule fois avant de lancer les workers. L'index est
+# toujours redemandé (GET conditionnel : 304 si inchangé) pour qu'un re-crawl répartisse la liste à jour
+async def prepare_index() -> None:
+    manifest = Manifest("manifest.json")
+    async with create_session(limit_per_host=1) as session:
+        df_authorised, df_withdrawn, index_changed = await download_index(
+            url_index_file, index_file_path, session=session, manifest=manifest)
+    if not index_changed and os.path.exists(path_authorised_csv) and os.path.exists(path_withdrawn_csv):
+        return
+    df_authorised_light = simplify_dataframe(
+        df_authorised, path_csv=path_authorised_csv, path_json="list_of_authorised_med.json",
+        authorised_names_clean=None)
+    simplify_dataframe(
+        df_withdrawn, path_csv=path_withdrawn_csv, path_json="list_of_withdrawn_med.json",
+        authorised_names_clean=set(df_authorised_light["Name"]))
+    manifest.save()
+
+
+# Renouvelle le bail de la part en cours tant que le worker y travaille. Bail perdu (repris par un autre worker) :
+# les téléchargements de la part sont annulés, la part appartient désormais à l'autre worker
+async def keep_lease(leases: LeaseTable, worker_id: str, shard: int, downloads: asyncio.Future) -> None:
+    while True:
+        await asyncio.sleep(leases.lease_ttl / 3)
+        if not leases.renew(worker_id, shard):
+            logger.warning(f"Worker {worker_id}: lease on shard {shard} lost (reclaimed by another worker).")
+            downloads.cancel()
+            return
+
+
+# Un worker : prend des parts dans la table des baux jusqu'à ce qu'il n'en reste plus. Les médicaments
+# authorised et withdrawn d'une part sont téléchargés en même temps ; toutes les requêtes de tous les
+# workers respectent le même budget (SharedRateBudget). Le manifest du worker est fusionné à la fin du crawl
+async def crawl_worker(
+        worker_id: str,
+        nb_shards: int,
+        revalidate: bool = False,
+        rate: float = 5.0,
+        lease_ttl: float = 300.0
+) -> None:
+    leases = LeaseTable(lease_db_path, lease_ttl)
+    leases.init_shards(nb_shards)
+    df_authorised_light = pd.read_csv(path_authorised_csv)
+    df_withdrawn_light = pd.read_csv(path_withdrawn_csv)
+
+    budget = SharedRateBudget(budget_db_path, rate=rate, burst=max(1, int(rate)))
+    # Manifest propre au worker, initialisé avec le manifest commun pour les GET conditionnels. Fichiers partiels
+    # propres au worker : deux workers ne complètent jamais le même fichier partiel
+    state = open_run_state(worker_manifest_path(worker_id), import_legacy=False, budget=budget,
+                           part_suffix=f".{worker_id}.part")
+    state.manifest.merge(["manifest.json"])
+    manifest, registries, limiter, inventory = state.manifest, state.registries, state.limiter, state.inventory
+    journal, store = state.journal, state.store
+
+    async with create_session(limit_per_host=limiter.max_concurrency) as session:
+        while True:
+            shard = leases.acquire(worker_id)
+            if shard is None:
+                if leases.pending() == 0:
+                    break
+                # Parts encore tenues par d'autres workers : attendre leur fin ou l'expiration de leur bail
+                await asyncio.sleep(min(30.0, leases.lease_ttl / 10))
+                continue
+            names_authorised = shard_names(df_authorised_light["Name"], shard, nb_shards)
+            names_withdrawn = shard_names(df_withdrawn_light["Name"], shard, nb_shards)
+            downloads = asyncio.gather(
+                download_files_languages(
+                    languages,
+                    df_authorised_light,
+                    dl_path="ema_authorised_rcp",
+                    nb_workers=5,
+                    registries=registries,
+                    status="Authorised",
+                    manifest=manifest,
+                    revalidate=revalidate,
+                    limiter=limiter,
+                    session=session,
+                    names={lang: names_authorised for lang in languages},
+                    inventory=inventory,
+                    journal=journal,
+                    store=store),
+                download_files_languages(
+                    languages,
+                    df_withdrawn_light,
+                    dl_path="ema_withdrawn_rcp",
+                    nb_workers=5,
+                    registries=registries,
+                    status="Withdrawn",
+                    manifest=manifest,
+                    revalidate=revalidate,
+                    limiter=limiter,
+                    session=session,
+                    names={lang: names_withdrawn for lang in languages},
+                    inventory=inventory,
+                    journal=journal,
+                    store=store))
+            renewal = asyncio.create_task(keep_lease(leases, worker_id, shard, downloads))
+            lease_lost = False
+            try:
+                with run_metrics.phase("shard"):
+                    await downloads
+            except asyncio.CancelledError:
+                # Annulation par keep_lease (bail perdu) : la part n'est pas marquée terminée ; sinon arrêt du worker
+                lease_lost = renewal.done() and not renewal.cancelled()
+                if not lease_lost:
+                    raise
+            finally:
+                renewal.cancel()
+            manifest.save()
+            if lease_lost:
+                continue
+            leases.complete(worker_id, shard)
+
+    manifest.save()
+    state.close()
+    budget.close()
+    leases.close()
+    run_metrics.write_json(f"log/run_report_{worker_id}.json")
+    logger.info(f"Worker {worker_id}: no shard left.")
+
+
+def run_worker(worker_id: str, nb_shards: int, revalidate: bool, rate: float, lease_ttl: float) -> None:
+    today_log = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+    logger.add(f"log/log_{today_log}_{worker_id}.log", rotation="500 KB", level="INFO", enqueue=True)
+    asyncio.run(crawl_worker(worker_id, nb_shards, revalidate, rate, lease_ttl))
+
+
+# Fin du crawl (dernier worker terminé) : manifests des workers fusionnés dans manifest.json,
+# listes des 404 et des échecs exportées
+def merge_results() -> None:
+    manifest = Manifest("manifest.json")
+    worker_manifests = sorted(glob.glob(worker_manifest_path("*")))
+    manifest.merge(worker_manifests)
+    manifest.save()
+    for path in worker_manifests:
+        os.remove(path)
+    for lang in languages:
+        registry = FailureRegistry(language_path("failure_registry.db", lang), import_legacy=False)
+        registry.export_csv(language_path("not_found_urls.csv", lang), NOT_FOUND)
+        registry.export_csv(language_path("failed_urls_authorised.csv", lang), FAILED, "Authorised")
+        registry.export_csv(language_path("failed_urls_withdrawn.csv", lang), FAILED, "Withdrawn")
+        registry.close()
+
+
+# Bases SQLite partagées par les workers créées avant leur lancement : des processus qui créent le même schéma
+# en même temps échouent ("table ... already exists")
+def prepare_databases(rate: float) -> None:
+    for lang in languages:
+        FailureRegistry(language_path("failure_registry.db", lang), import_legacy=False).close()
+    RunJournal("run_journal.db").close()
+    if isinstance(create_storage(storage_url, s3_endpoint_url), LocalStorage):
+        BlobStore("blob_store").close()
+    SharedRateBudget(budget_db_path, rate=rate, burst=max(1, int(rate))).close()
+
+
+# Lance nb_processes workers sur cette machine (identifiants <hôte>-<n> : un worker relancé après un arrêt
+# reprend directement ses parts). D'autres machines partageant le dossier peuvent lancer le même script
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sharded crawl of the EMA SmPC PDFs")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes on this machine")
+    parser.add_argument("--shards", type=int, default=64, help="number of shards of the medicine list")
+    parser.add_argument("--rate", type=float, default=5.0, help="global request budget (req/s, all workers)")
+    parser.add_argument("--lease-ttl", type=float, default=300.0, help="lease duration in seconds")
+    parser.add_argument("--revalidate", action="store_true", help="re-crawl: conditional GET of every PDF (full GET if absent from the manifest)")
+    parser.add_argument("--reset", action="store_true", help="start a new crawl (all shards to do)")
+    args = parser.parse_args()
+
+    asyncio.run(prepare_index())
+    leases = LeaseTable(lease_db_path, args.lease_ttl)
+    leases.init_shards(args.shards, reset=args.reset)
+    prepare_databases(args.rate)
+
+    host = socket.gethostname()
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            name=f"{host}-{i}",
+            args=(f"{host}-{i}", args.shards, args.revalidate, args.rate, args.lease_ttl))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        logger.error(f"{len(failed)} worker processes exited with an error: {', '.join(failed)}.")
+
+    if leases.pending() == 0:
+        merge_results()
+        logger.info("Sharded crawl completed, manifests merged into manifest.json.")
+    else:
+        logger.info(f"{leases.pending()} shards still leased by other workers: results merged by the last one.")
+    leases.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,269 @@
 from loguru import logger
-from datetime import datetime
+from datetime import date, datetime
 import asyncio
-from adapters.download_file import download_index, download_files
+import os
+import pandas as pd
+from typing import AbstractSet
+from adapters.download_file import download_index, language_path, url_index_file
 from core.manipulate_df import simplify_dataframe
-from core.update_rcp import rename_update_rcp, update_rcp, change_status
-
-# Configurer le logger
-today_log: str = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
-today: str = datetime.now().strftime("%d-%m-%Y")
-logger.add(f"log/log_{today_log}.log", rotation="500 KB", level="INFO")  # Log
-
-url_index_file: str = (
-    "https://www.ema.europa.eu/en/documents/report/medicines-output-medicines-report_en.xlsx"  # noqa:E501
-)
-index_file_path: str = "index_file.xlsx"
-language: str = "en"
-
-# Télécharger le fichier d'index des médicaments (Medicine Data Table)
-df_authorised, df_withdrawn = asyncio.run(download_index(url_index_file, index_file_path))
-
-# Simplifier les dataframes
-df_authorised_light = simplify_dataframe(
-    df_authorised,
-    path_csv="archives_authorised/simplified_file.csv",
-    path_json="list_of_authorised_med.json",
-    authorised_names_clean=None)
-logger.info("Authorised medicines DataFrame successfully simplified.")
-
-authorised_names_clean = set(df_authorised_light["Name"])
-
-df_withdrawn_light = simplify_dataframe(
-    df_withdrawn,
-    path_csv="archives_withdrawn/simplified_file.csv",
-    path_json="list_of_withdrawn_med.json",
-    authorised_names_clean=authorised_names_clean)
-logger.info("Withdrawn medicines DataFrame successfully simplified.")
-
-# Renommer les fichiers RCP mis à jour
-rename_update_rcp(
-    df_authorised_today_path="archives_authorised/simplified_file.csv",
-    df_authorised_yesterday_path=f"archives_authorised/simplified_file.csv_{today}.csv"
-)
-# Mettre à jour les RCP
-asyncio.run(update_rcp(
-    df_authorised_light,
-    language,
-    nb_workers=5,
-    failed_urls_file="failed_urls_authorised.csv",
-    dl_path="ema_authorised_rcp",
-    status="Authorised"))
-
-# Télécharger les fichiers PDF authorised
-logger.info("Downloading authorised RCP files...")
-asyncio.run(download_files(
-    language,
-    df_authorised_light,
-    dl_path="ema_authorised_rcp",
-    nb_workers=5,
-    failed_urls_file="failed_urls_authorised.csv",
-    status="Authorised"))
-
-# Télécharger les fichiers PDF withdrawn
-logger.info("Downloading withdrawn RCP files...")
-asyncio.run(download_files(
-    language,
-    df_withdrawn_light,
-    dl_path="ema_withdrawn_rcp",
-    nb_workers=5,
-    failed_urls_file="failed_urls_withdrawn.csv",
-    status="Withdrawn"))
-
-# Supprimer les fichiers RCP ayant un statut "Withdrawn" du dossier des RCP autorisés
-logger.info("Removing authorised RCP files that are now withdrawn...")
-change_status(df_authorised_light)
-change_status(df_withdrawn_light)
-
-logger.info("All tasks completed successfully.")
\ No newline at end of file
+from core.update_rcp import rename_update_rcp, update_names, remove_old_version, apply_status_change
+from core.revision_diff import ChangeSet, load_change_set
+from core.revalidation import revalidation_names
+from adapters.manifest import Manifest
+from adapters.failure_registry import FAILED, NOT_FOUND
+from adapters.http_session import create_session
+from adapters.inventory import Inventory
+from adapters.metrics import run_metrics
+from adapters.pdf_verifier import PdfVerifier
+from adapters.blob_store import BlobStore
+from adapters.storage import create_storage, LocalStorage
+from adapters.text_index import TextIndex
+from adapters.job_scheduler import (JobScheduler, PRIORITY_UPDATE, PRIORITY_AUTHORISED, PRIORITY_WITHDRAWN,
+                                   PRIORITY_REVALIDATE)
+from core.paths import pdf_dirs
+from run_state import open_run_state
+from config import (index_file_path, path_authorised_csv, path_withdrawn_csv, languages, prometheus_path,
+                    storage_url, s3_endpoint_url, revalidate_days)
+
+
+# Configurer le logger (appelé par chaque commande, aucun effet de bord à l'import du module).
+# Renvoie l'horodatage du run, utilisé dans le nom des fichiers de log et du rapport
+def configure_logging() -> str:
+    today_log = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+    # enqueue=True : l'écriture du fichier de log se fait dans un thread, hors de la boucle d'événements
+    logger.add(f"log/log_{today_log}.log", rotation="500 KB", level="INFO", enqueue=True)  # Log
+    return today_log
+
+
+# Met en file les téléchargements d'une langue. Les médicaments de la liste withdrawn dont la copie authorised
+# est encore présente (passés withdrawn, y compris lors d'un run interrompu) changent de dossier : vue déplacée
+# tout de suite avec le blob store, sinon copie authorised supprimée une fois la copie withdrawn téléchargée.
+# Les fichiers déjà téléchargés sont revérifiés (GET conditionnel) en dernier : tous au premier lancement,
+# sinon une partie chaque jour (chaque fichier tous les revalidate_days jours)
+def queue_downloads(
+        scheduler: JobScheduler,
+        lang: str,
+        df_authorised_light: pd.DataFrame,
+        df_withdrawn_light: pd.DataFrame,
+        names_authorised: AbstractSet[str] | None,
+        names_withdrawn: AbstractSet[str] | None,
+        changes_authorised: ChangeSet | None,
+        manifest: Manifest,
+        inventory: Inventory,
+        store: BlobStore | None,
+        revalidate_days: int = 7
+) -> None:
+    dl_path_authorised = language_path("ema_authorised_rcp", lang)
+    dl_path_withdrawn = language_path("ema_withdrawn_rcp", lang)
+    moved = {name for name in df_withdrawn_light["Name"] if inventory.exists(f"{dl_path_authorised}/{name}.pdf")}
+
+    def status_hook(drug_name: str) -> None:
+        if drug_name in moved:
+            apply_status_change(drug_name, manifest, inventory, lang, store, moved=True)
+
+    def remove_old_hook(drug_name: str) -> None:
+        remove_old_version(drug_name, dl_path_authorised, inventory)
+
+    # Nouvelles révisions : l'ancienne version est supprimée dès que la nouvelle est téléchargée
+    scheduler.add_downloads(
+        df_authorised_light, dl_path_authorised, "Authorised", lang, PRIORITY_UPDATE,
+        names=update_names(df_authorised_light, dl_path_authorised, changes_authorised, inventory, store),
+        revalidate=store is not None,
+        after=remove_old_hook)
+    scheduler.add_downloads(
+        df_authorised_light, dl_path_authorised, "Authorised", lang, PRIORITY_AUTHORISED,
+        names=names_authorised)
+    if store is not None:
+        for drug_name in sorted(moved):
+            status_hook(drug_name)
+        scheduler.add_downloads(
+            df_withdrawn_light, dl_path_withdrawn, "Withdrawn", lang, PRIORITY_WITHDRAWN, names=names_withdrawn)
+    else:
+        scheduler.add_downloads(
+            df_withdrawn_light, dl_path_withdrawn, "Withdrawn", lang, PRIORITY_WITHDRAWN,
+            names=names_withdrawn | moved if names_withdrawn is not None else None,
+            after=status_hook)
+
+    nb_days = 1 if changes_authorised is None else revalidate_days
+    day = date.today().toordinal()
+    for df_light, dl_path, status in ((df_authorised_light, dl_path_authorised, "Authorised"),
+                                      (df_withdrawn_light, dl_path_withdrawn, "Withdrawn")):
+        scheduler.add_downloads(
+            df_light, dl_path, status, lang, PRIORITY_REVALIDATE,
+            names=revalidation_names(df_light["Name"], dl_path, inventory.names(dl_path), manifest.entries,
+                                     nb_days, day),
+            revalidate=True)
+
+
+# Orchestrateur : une seule boucle d'événements et une seule session HTTP pour toutes les étapes
+async def main() -> None:
+    today_log = configure_logging()
+    today = datetime.now().strftime("%d-%m-%Y")
+    state = open_run_state()
+    manifest, registries, limiter, inventory = state.manifest, state.registries, state.limiter, state.inventory
+    journal, resolver, store = state.journal, state.resolver, state.store
+
+    # Vérifier les PDF nouveaux ou modifiés depuis le dernier run : les fichiers corrompus sont supprimés
+    # et, devenus manquants, sont retéléchargés plus bas
+    if state.is_local:
+        with run_metrics.phase("verify"):
+            PdfVerifier("verify_state.json").verify(state.dl_paths, inventory, manifest)
+
+    async with create_session(limit_per_host=limiter.max_concurrency) as session:
+        # Télécharger le fichier d'index des médicaments (Medicine Data Table)
+        with run_metrics.phase("download_index"):
+            df_authorised, df_withdrawn, index_changed = await download_index(
+                url_index_file, index_file_path, limiter, session, manifest)
+
+        if not index_changed and os.path.exists(path_authorised_csv) and os.path.exists(path_withdrawn_csv):
+            # Index inchangé : pas de simplification ni de comparaison, seuls les fichiers manquants sont téléchargés
+            logger.info("Index unchanged: skipping simplification and revision comparison.")
+            df_authorised_light = pd.read_csv(path_authorised_csv)
+            df_withdrawn_light = pd.read_csv(path_withdrawn_csv)
+            changes_authorised = ChangeSet()
+            changes_withdrawn = ChangeSet()
+        else:
+            # Simplifier les dataframes
+            with run_metrics.phase("simplify"):
+                df_authorised_light = simplify_dataframe(
+                    df_authorised,
+                    path_csv=path_authorised_csv,
+                    path_json="list_of_authorised_med.json",
+                    authorised_names_clean=None)
+                logger.info("Authorised medicines DataFrame successfully simplified.")
+
+                authorised_names_clean = set(df_authorised_light["Name"])
+
+                df_withdrawn_light = simplify_dataframe(
+                    df_withdrawn,
+                    path_csv=path_withdrawn_csv,
+                    path_json="list_of_withdrawn_med.json",
+                    authorised_names_clean=authorised_names_clean)
+                logger.info("Withdrawn medicines DataFrame successfully simplified.")
+
+            # Renommer les fichiers RCP mis à jour et calculer les changements depuis la veille
+            with run_metrics.phase("revision_diff"):
+                changes_authorised = rename_update_rcp(
+                    df_authorised_today_path=path_authorised_csv,
+                    df_authorised_yesterday_path=f"{path_authorised_csv}_{today}.csv",
+                    df_withdrawn_today_path=path_withdrawn_csv,
+                    inventory=inventory,
+                    dl_paths=[language_path("ema_authorised_rcp", lang) for lang in languages],
+                    store=store
+                )
+                changes_withdrawn = load_change_set(
+                    path_withdrawn_csv,
+                    f"{path_withdrawn_csv}_{today}.csv")
+
+        # Sans ChangeSet (premier lancement) : parcours complet ; sinon nouveaux médicaments, fichiers manquants
+        # et téléchargements laissés inachevés par un run interrompu
+        names_authorised: dict[str, AbstractSet[str] | None] = {}
+        names_withdrawn: dict[str, AbstractSet[str] | None] = {}
+        for lang in languages:
+            dl_path_authorised = language_path("ema_authorised_rcp", lang)
+            dl_path_withdrawn = language_path("ema_withdrawn_rcp", lang)
+            names_authorised[lang] = None
+            if changes_authorised is not None:
+                names_authorised[lang] = (changes_authorised.added
+                                          | inventory.missing(dl_path_authorised, df_authorised_light["Name"])
+                                          | journal.unfinished(dl_path_authorised))
+            names_withdrawn[lang] = None
+            if changes_withdrawn is not None:
+                names_withdrawn[lang] = (changes_withdrawn.added
+                                         | inventory.missing(dl_path_withdrawn, df_withdrawn_light["Name"])
+                                         | journal.unfinished(dl_path_withdrawn))
+
+        # File de priorité unique : nouvelles révisions, nouveaux authorised, withdrawn, revérifications ; les échecs sont
+        # remis en file avec un délai et les changements de statut sont appliqués dès que leurs entrées sont prêtes
+        with run_metrics.phase("downloads"):
+            scheduler = JobScheduler(session, limiter, registries, manifest, inventory, journal, resolver, store)
+            for lang in languages:
+                queue_downloads(scheduler, lang, df_authorised_light, df_withdrawn_light, names_authorised[lang],
+                                names_withdrawn[lang], changes_authorised, manifest, inventory, store, revalidate_days)
+            await scheduler.run()
+            for lang, registry in registries.items():
+                registry.export_csv(language_path("failed_urls_authorised.csv", lang), FAILED, "Authorised")
+                registry.export_csv(language_path("failed_urls_withdrawn.csv", lang), FAILED, "Withdrawn")
+
+    # Indexer le texte des RCP nouveaux ou modifiés (recherche plein texte par rubrique, rcp_text_index.db)
+    if state.is_local:
+        with run_metrics.phase("text_index"):
+            text_index = TextIndex("rcp_text_index.db")
+            for df_light, dl_path, status in ((df_authorised_light, "ema_authorised_rcp", "Authorised"),
+                                              (df_withdrawn_light, "ema_withdrawn_rcp", "Withdrawn")):
+                revisions = {name.replace(" ", "-"): int(revision)
+                             for name, revision in zip(df_light["Name"], df_light["Revision_nb"])}
+                for lang in languages:
+                    text_index.update(language_path(dl_path, lang), status, lang, inventory, revisions)
+            text_index.close()
+
+    manifest.save()
+    resolver.save()
+    for lang, registry in registries.items():
+        registry.export_csv(language_path("not_found_urls.csv", lang), NOT_FOUND)
+    state.close()
+
+    # Rapport JSON du run
+    run_metrics.write_json(f"log/run_report_{today_log}.json")
+    run_metrics.write_prometheus(prometheus_path)
+    logger.info("All tasks completed successfully.")
+
+
+# Relance uniquement les téléchargements échoués des runs précédents (registres des échecs), sans télécharger
+# l'index : mêmes files de priorité et mêmes délais de relance que main(). Renvoie False si aucun index n'a encore
+# été téléchargé (pas de fichiers simplifiés en cache : rien à relancer)
+async def retry() -> bool:
+    today_log = configure_logging()
+    if not (os.path.exists(path_authorised_csv) and os.path.exists(path_withdrawn_csv)):
+        logger.warning("No cached index: nothing to retry before a first sync.")
+        return False
+    state = open_run_state()
+    df_authorised_light = pd.read_csv(path_authorised_csv)
+    df_withdrawn_light = pd.read_csv(path_withdrawn_csv)
+
+    async with create_session(limit_per_host=state.limiter.max_concurrency) as session:
+        with run_metrics.phase("retry"):
+            scheduler = JobScheduler(session, state.limiter, state.registries, state.manifest, state.inventory,
+                                     state.journal, state.resolver, state.store)
+            for lang, registry in state.registries.items():
+                for df_light, dl_path, status, priority in (
+                        (df_authorised_light, "ema_authorised_rcp", "Authorised", PRIORITY_AUTHORISED),
+                        (df_withdrawn_light, "ema_withdrawn_rcp", "Withdrawn", PRIORITY_WITHDRAWN)):
+                    failed = {name for name, _ in registry.failed(status)}
+                    scheduler.add_downloads(df_light, language_path(dl_path, lang), status, lang, priority,
+                                            names=failed)
+            await scheduler.run()
+
+    state.resolver.save()
+    for lang, registry in state.registries.items():
+        registry.export_csv(language_path("failed_urls_authorised.csv", lang), FAILED, "Authorised")
+        registry.export_csv(language_path("failed_urls_withdrawn.csv", lang), FAILED, "Withdrawn")
+    state.close()
+    run_metrics.write_json(f"log/run_report_{today_log}.json")
+    logger.info("Retry completed.")
+    return True
+
+
+# Vérifie les PDF stockés (full=True : y compris ceux déjà vérifiés) ; les fichiers corrompus sont supprimés
+# et seront retéléchargés par le prochain sync. Renvoie {fichier: raison}, ou None si la vérification n'est pas
+# disponible (stockage S3)
+def verify(full: bool = False) -> dict[str, str] | None:
+    configure_logging()
+    storage = create_storage(storage_url, s3_endpoint_url)
+    if not isinstance(storage, LocalStorage):
+        logger.error("PDF verification is only available for local storage.")
+        return None
+    manifest = Manifest("manifest.json")
+    dl_paths = pdf_dirs(languages)
+    inventory = Inventory(dl_paths, storage)
+    verifier = PdfVerifier("verify_state.json")
+    if full:
+        verifier.verified = {}
+    corrupt = verifier.verify(dl_paths, inventory, manifest)
+    manifest.save()
+    return corrupt
+
+
+# Garde nécessaire : les processus du pool de vérification réimportent le module principal
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from adapters.download_file import SPECIAL_CASES_AUTHORISED, SPECIAL_CASES_WITHDRAWN
+from adapters.manifest import Manifest
+from adapters.failure_registry import FailureRegistry
+from adapters.rate_limiter import AdaptiveRateLimiter, SharedRateBudget
+from adapters.inventory import Inventory
+from adapters.run_journal import RunJournal
+from adapters.slug_resolver import SlugResolver
+from adapters.blob_store import BlobStore
+from adapters.storage import create_storage, LocalStorage, S3Storage
+from core.paths import language_path, pdf_dirs
+from config import languages, storage_url, s3_endpoint_url
+
+
+# État partagé par toutes les étapes d'un run (sync, retry, worker du crawl réparti) : une seule construction,
+# pour que les commandes ne divergent pas (chemins des bases, dossiers des PDF, limiteur, stockage)
+@dataclass
+class RunState:
+    manifest: Manifest
+    registries: dict[str, FailureRegistry]  # langue -> registre des 404 et des échecs
+    limiter: AdaptiveRateLimiter
+    dl_paths: list[str]
+    storage: LocalStorage | S3Storage
+    inventory: Inventory
+    journal: RunJournal
+    resolver: SlugResolver
+    store: BlobStore | None  # stockage adressé par contenu, disque local uniquement
+
+    @property
+    def is_local(self) -> bool:
+        return isinstance(self.storage, LocalStorage)
+
+    # Le manifest et le cache des slugs sont enregistrés par l'appelant (un worker n'écrit que son propre manifest)
+    def close(self) -> None:
+        for registry in self.registries.values():
+            registry.close()
+        self.journal.close()
+        if self.store is not None:
+            self.store.close()
+
+
+# manifest_path : manifest propre à un worker du crawl réparti ; import_legacy : reprise des anciens CSV d'échecs
+# (langue historique, premier lancement) ; budget : budget de requêtes commun aux workers ; part_suffix : fichiers
+# partiels propres au worker
+def open_run_state(
+        manifest_path: str = "manifest.json",
+        import_legacy: bool = True,
+        budget: SharedRateBudget | None = None,
+        part_suffix: str = ".part"
+) -> RunState:
+    # Manifest des PDF téléchargés (ETag, Last-Modified, taille, hash) pour les GET conditionnels
+    manifest = Manifest(manifest_path)
+    # Registres des 404 et des échecs de téléchargement (un par langue) partagés par toutes les étapes
+    registries = {
+        lang: FailureRegistry(language_path("failure_registry.db", lang), import_legacy=import_legacy and lang == "en")
+        for lang in languages
+    }
+    # Limiteur adaptatif partagé par toutes les requêtes vers l'EMA
+    limiter = AdaptiveRateLimiter(initial_concurrency=5, max_concurrency=16, budget=budget)
+    # Inventaire des PDF déjà téléchargés (un seul parcours par dossier)
+    dl_paths = pdf_dirs(languages)
+    storage = create_storage(storage_url, s3_endpoint_url, part_suffix=part_suffix)
+    inventory = Inventory(dl_paths, storage)
+    # Journal du run : reprise des téléchargements interrompus (y compris fichiers partiels)
+    journal = RunJournal("run_journal.db")
+    # Slugs d'URL résolus après un 404 (initialisés avec les cas particuliers connus)
+    resolver = SlugResolver("slug_cache.json", seeds={**SPECIAL_CASES_AUTHORISED, **SPECIAL_CASES_WITHDRAWN})
+    # Stockage adressé par contenu (disque local) : les dossiers ema_*_rcp sont des vues, l'historique des versions est conservé
+    store = BlobStore("blob_store") if isinstance(storage, LocalStorage) else None
+    return RunState(manifest, registries, limiter, dl_paths, storage, inventory, journal, resolver, store)
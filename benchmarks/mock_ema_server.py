@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import io
+import random
+from collections import Counter
+from dataclasses import dataclass
+from email.utils import formatdate
+from functools import lru_cache
+import pandas as pd
+from aiohttp import web
+
+INDEX_PATH = "/en/documents/report/medicines-output-medicines-report_en.xlsx"
+
+
+# Paramètres du serveur local imitant le site de l'EMA
+@dataclass
+class MockConfig:
+    nb_authorised: int = 200
+    nb_withdrawn: int = 50
+    pdf_size: int = 256 * 1024
+    latency_min: float = 0.0
+    latency_max: float = 0.0
+    not_found_rate: float = 0.0
+    burst_every: int = 0  # tous les N requêtes, une rafale de 429 (0 = jamais)
+    burst_len: int = 5
+    retry_after: int = 1
+    drop_rate: float = 0.0  # proportion de connexions coupées au milieu du corps
+    seed: int = 42
+
+
+# Serveur aiohttp local : index xlsx + PDF synthétiques, avec latence, 404, rafales de 429
+# (Retry-After) et connexions coupées injectables
+class MockEmaServer:
+
+    def __init__(self, config: MockConfig | None = None):
+        self.config = config or MockConfig()
+        self.random = random.Random(self.config.seed)
+        self.stats: Counter = Counter()
+        self._burst_remaining = 0
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+        self.medicines = pd.DataFrame({
+            "Category": "Human",
+            "Name of medicine": [f"Medicine {i:05d}" for i in range(self.config.nb_authorised + self.config.nb_withdrawn)],
+            "Revision number": [self.random.randint(0, 20) for _ in range(self.config.nb_authorised + self.config.nb_withdrawn)],
+            "Medicine status": ["Authorised"] * self.config.nb_authorised + ["Withdrawn"] * self.config.nb_withdrawn,
+            "Therapeutic area": "Benchmark",
+        })
+        self._build_index()
+
+    @staticmethod
+    def slug(name: str) -> str:
+        return f"{name.replace(' ', '-').lower()}-epar-product-information"
+
+    def _build_index(self) -> None:
+        buffer = io.BytesIO()
+        # Le rapport de l'EMA comporte 8 lignes d'en-tête avant le tableau
+        self.medicines.to_excel(buffer, startrow=8, index=False)
+        self.index_bytes = buffer.getvalue()
+        self.index_etag = f'"{hashlib.sha256(self.index_bytes).hexdigest()[:16]}"'
+        self._revisions = {
+            self.slug(name): rev
+            for name, rev in zip(self.medicines["Name of medicine"], self.medicines["Revision number"])
+        }
+
+    # Nouvelle révision pour k médicaments autorisés (nouveau contenu PDF et index modifié)
+    def bump_revisions(self, k: int) -> list[str]:
+        authorised = self.medicines.index[self.medicines["Medicine status"] == "Authorised"]
+        chosen = self.random.sample(list(authorised), min(k, len(authorised)))
+        self.medicines.loc[chosen, "Revision number"] += 1
+        self._build_index()
+        return list(self.medicines.loc[chosen, "Name of medicine"])
+
+    # Passage de k médicaments autorisés au statut withdrawn
+    def withdraw(self, k: int) -> list[str]:
+        authorised = self.medicines.index[self.medicines["Medicine status"] == "Authorised"]
+        chosen = self.random.sample(list(authorised), min(k, len(authorised)))
+        self.medicines.loc[chosen, "Medicine status"] = "Withdrawn"
+        self._build_index()
+        return list(self.medicines.loc[chosen, "Name of medicine"])
+
+    def _is_not_found(self, slug: str) -> bool:
+        if slug not in self._revisions:
+            return True
+        bucket = int(hashlib.sha256(slug.encode()).hexdigest()[:8], 16) % 10_000
+        return bucket < self.config.not_found_rate * 10_000
+
+    @lru_cache(maxsize=64)
+    def _document(self, slug: str, revision: int, language: str) -> bytes:
+        header = f"%PDF-1.4\n% {slug} revision {revision} {language}\n".encode()
+        trailer = b"\n%%EOF\n"
+        block = hashlib.sha256(f"{slug}{revision}".encode()).digest() * 2048
+        filler_size = max(0, self.config.pdf_size - len(header) - len(trailer))
+        filler = (block * (filler_size // len(block) + 1))[:filler_size]
+        return header + filler + trailer
+
+    async def _before_response(self) -> web.Response | None:
+        self.stats["requests"] += 1
+        if self.config.latency_max > 0:
+            await asyncio.sleep(self.random.uniform(self.config.latency_min, self.config.latency_max))
+        if self.config.burst_every and self.stats["requests"] % self.config.burst_every == 0:
+            self._burst_remaining = self.config.burst_len
+        if self._burst_remaining > 0:
+            self._burst_remaining -= 1
+            self.stats["status_429"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.config.retry_after)})
+        return None
+
+    async def _send(self, request: web.Request, body: bytes, etag: str, last_modified: str) -> web.StreamResponse:
+        headers = {"ETag": etag, "Last-Modified": last_modified, "Accept-Ranges": "bytes"}
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["status_304"] += 1
+            return web.Response(status=304, headers=headers)
+
+        status, start = 200, 0
+        range_header = request.headers.get("Range", "")
+        if range_header.startswith("bytes=") and request.headers.get("If-Range", etag) == etag:
+            start = int(range_header[len("bytes="):].split("-", 1)[0] or 0)
+            if start >= len(body):
+                self.stats["status_416"] += 1
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{len(body)}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+
+        payload = body[start:]
+        if request.method == "HEAD":
+            self.stats[f"status_{status}"] += 1
+            return web.Response(status=status, headers={**headers, "Content-Length": str(len(payload))})
+        resp = web.StreamResponse(status=status, headers=headers)
+        resp.content_length = len(payload)
+        await resp.prepare(request)
+        if self.config.drop_rate and self.random.random() < self.config.drop_rate:
+            # Connexion coupée au milieu du corps
+            await resp.write(payload[:len(payload) // 2])
+            self.stats["dropped"] += 1
+            self.stats["bytes_sent"] += len(payload) // 2
+            request.transport.close()
+            return resp
+        await resp.write(payload)
+        await resp.write_eof()
+        self.stats[f"status_{status}"] += 1
+        self.stats["bytes_sent"] += len(payload)
+        return resp
+
+    async def handle_index(self, request: web.Request) -> web.StreamResponse:
+        throttled = await self._before_response()
+        if throttled is not None:
+            return throttled
+        return await self._send(request, self.index_bytes, self.index_etag, formatdate(0, usegmt=True))
+
+    async def handle_pdf(self, request: web.Request) -> web.StreamResponse:
+        throttled = await self._before_response()
+        if throttled is not None:
+            return throttled
+        language = request.match_info["language"]
+        slug = request.match_info["file"].rsplit(f"_{language}.pdf", 1)[0]
+        if self._is_not_found(slug):
+            self.stats["status_404"] += 1
+            return web.Response(status=404)
+        revision = self._revisions[slug]
+        body = self._document(slug, revision, language)
+        return await self._send(request, body, f'"{slug}-{revision}"', formatdate(revision * 86400, usegmt=True))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(INDEX_PATH, self.handle_index)
+        app.router.add_route("*", "/{language}/documents/product-information/{file}", self.handle_pdf)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> str:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def reset_stats(self) -> Counter:
+        stats, self.stats = self.stats, Counter()
+        return stats
+
+
+if __name__ == "__main__":
+    web.run_app(MockEmaServer().app(), host="127.0.0.1", port=8080)
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from loguru import logger  # noqa: E402
+from mock_ema_server import INDEX_PATH, MockConfig, MockEmaServer  # noqa: E402
+
+
+# Mesures d'une étape : temps, documents, octets et requêtes gaspillées (vues côté serveur)
+def phase_report(name: str, wall_time: float, stats) -> dict:
+    docs = stats["status_200"] + stats["status_206"]
+    wasted = stats["status_429"] + stats["status_404"] + stats["status_416"] + stats["dropped"]
+    return {
+        "phase": name,
+        "wall_time_s": round(wall_time, 3),
+        "requests": stats["requests"],
+        "docs": docs,
+        "not_modified": stats["status_304"],
+        "bytes": stats["bytes_sent"],
+        "wasted_requests": wasted,
+        "docs_per_s": round(docs / wall_time, 2) if wall_time else 0.0,
+        "mb_per_s": round(stats["bytes_sent"] / wall_time / 1e6, 2) if wall_time else 0.0,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> tuple[list[dict], dict]:
+    server = MockEmaServer(MockConfig(
+        nb_authorised=args.authorised,
+        nb_withdrawn=args.withdrawn,
+        pdf_size=args.pdf_size,
+        latency_min=args.latency_min,
+        latency_max=args.latency_max,
+        not_found_rate=args.not_found_rate,
+        burst_every=args.burst_every,
+        burst_len=args.burst_len,
+        retry_after=args.retry_after,
+        drop_rate=args.drop_rate,
+    ))
+    base_url = await server.start(port=args.port)
+    # L'adresse de l'EMA est lue à l'import de download_file
+    os.environ["EMA_BASE_URL"] = base_url
+
+    from adapters.download_file import download_index, download_files, retry_failed_downloads
+    from adapters.failure_registry import FailureRegistry
+    from adapters.http_session import create_session
+    from adapters.inventory import Inventory
+    from adapters.job_scheduler import JobScheduler, PRIORITY_AUTHORISED, PRIORITY_WITHDRAWN
+    from adapters.manifest import Manifest
+    from adapters.metrics import run_metrics
+    from adapters.rate_limiter import AdaptiveRateLimiter
+    from adapters.run_journal import RunJournal
+    from core.manipulate_df import simplify_dataframe
+    from core.update_rcp import rename_update_rcp, update_rcp
+
+    os.chdir(tempfile.mkdtemp(prefix="ema_rcp_bench_"))
+    today = time.strftime("%d-%m-%Y")
+    reports: list[dict] = []
+
+    async def phase(name: str, coro):
+        server.reset_stats()
+        start = time.perf_counter()
+        result = await coro
+        reports.append(phase_report(name, time.perf_counter() - start, server.reset_stats()))
+        return result
+
+    def simplify(df_authorised, df_withdrawn):
+        df_authorised_light = simplify_dataframe(
+            df_authorised, "archives_authorised/simplified_file.csv", "list_of_authorised_med.json")
+        df_withdrawn_light = simplify_dataframe(
+            df_withdrawn, "archives_withdrawn/simplified_file.csv", "list_of_withdrawn_med.json",
+            set(df_authorised_light["Name"]))
+        return df_authorised_light, df_withdrawn_light
+
+    manifest = Manifest("manifest.json")
+    registry = FailureRegistry("failure_registry.db")
+    inventory = Inventory(["ema_authorised_rcp", "ema_withdrawn_rcp"])
+    journal = RunJournal("run_journal.db")
+    limiter = AdaptiveRateLimiter(initial_concurrency=args.workers, max_concurrency=args.max_workers)
+    index_url = f"{base_url}{INDEX_PATH}"
+    common = dict(registry=registry, manifest=manifest, limiter=limiter, inventory=inventory, journal=journal)
+
+    async with create_session(limit_per_host=args.max_workers) as session:
+        # Premier lancement : index puis téléchargement complet. Une seule passe par dossier (retry_passes=0) :
+        # les relances des échecs sont mesurées à part
+        df_authorised, df_withdrawn, _ = await phase(
+            "download_index", download_index(index_url, "index_file.xlsx", limiter, session, manifest))
+        df_authorised_light, df_withdrawn_light = simplify(df_authorised, df_withdrawn)
+        await phase("download_files_authorised", download_files(
+            "en", df_authorised_light, "ema_authorised_rcp", args.workers, status="Authorised",
+            session=session, retry_passes=0, **common))
+        await phase("download_files_withdrawn", download_files(
+            "en", df_withdrawn_light, "ema_withdrawn_rcp", args.workers, status="Withdrawn",
+            session=session, retry_passes=0, **common))
+
+        async def retry_all():
+            for status, dl_path in (("Authorised", "ema_authorised_rcp"), ("Withdrawn", "ema_withdrawn_rcp")):
+                for _ in range(args.max_retry_passes):
+                    if not await retry_failed_downloads(registry, dl_path, status, "en", args.workers,
+                                                        manifest, limiter, session, inventory, journal):
+                        break
+        await phase("retry_failed_downloads", retry_all())
+
+        # Mise à jour quotidienne : nouvelles révisions côté serveur puis update_rcp
+        server.bump_revisions(args.bumps)
+        df_authorised, df_withdrawn, index_changed = await phase(
+            "download_index_update", download_index(index_url, "index_file.xlsx", limiter, session, manifest))
+        df_authorised_light, df_withdrawn_light = simplify(df_authorised, df_withdrawn)
+        changes = rename_update_rcp(
+            "archives_authorised/simplified_file.csv",
+            f"archives_authorised/simplified_file.csv_{today}.csv",
+            "archives_withdrawn/simplified_file.csv",
+            inventory=inventory)
+        await phase("update_rcp", update_rcp(
+            df_authorised_light, registry, "en", args.workers, "ema_authorised_rcp", "Authorised",
+            manifest, limiter, session, changes, inventory, journal))
+
+        # Même téléchargement complet par la file de priorité de main.py (dossiers vides, relances différées
+        # dans la file au lieu de passes successives)
+        os.makedirs("scheduler", exist_ok=True)
+        scheduler_registry = FailureRegistry("scheduler/failure_registry.db", import_legacy=False)
+        scheduler_journal = RunJournal("scheduler/run_journal.db")
+        scheduler = JobScheduler(
+            session,
+            AdaptiveRateLimiter(initial_concurrency=args.workers, max_concurrency=args.max_workers),
+            {"en": scheduler_registry},
+            Manifest("scheduler/manifest.json"),
+            Inventory(["scheduler/ema_authorised_rcp", "scheduler/ema_withdrawn_rcp"]),
+            scheduler_journal,
+            retry_backoff=args.retry_backoff)
+        scheduler.add_downloads(
+            df_authorised_light, "scheduler/ema_authorised_rcp", "Authorised", "en", PRIORITY_AUTHORISED)
+        scheduler.add_downloads(
+            df_withdrawn_light, "scheduler/ema_withdrawn_rcp", "Withdrawn", "en", PRIORITY_WITHDRAWN)
+        await phase("job_scheduler", scheduler.run())
+
+    await server.stop()
+    registry.close()
+    journal.close()
+    scheduler_registry.close()
+    scheduler_journal.close()
+    return reports, run_metrics.to_dict()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the EMA SmPC download pipeline against a local mock server.")
+    parser.add_argument("--authorised", type=int, default=200)
+    parser.add_argument("--withdrawn", type=int, default=50)
+    parser.add_argument("--pdf-size", type=int, default=256 * 1024, help="Size of each synthetic PDF in bytes")
+    parser.add_argument("--latency-min", type=float, default=0.01)
+    parser.add_argument("--latency-max", type=float, default=0.05)
+    parser.add_argument("--not-found-rate", type=float, default=0.02)
+    parser.add_argument("--burst-every", type=int, default=100, help="Start a burst of 429 every N requests (0 = never)")
+    parser.add_argument("--burst-len", type=int, default=5)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--drop-rate", type=float, default=0.01)
+    parser.add_argument("--bumps", type=int, default=10, help="Revision updates between the two runs")
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument("--max-retry-passes", type=int, default=5)
+    parser.add_argument("--retry-backoff", type=float, default=1.0, help="JobScheduler delay before a first retry (s)")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    start = time.perf_counter()
+    reports, client_metrics = asyncio.run(run_benchmark(args))
+    total = time.perf_counter() - start
+
+    print(f"{'phase':<28}{'wall(s)':>9}{'req':>7}{'docs':>7}{'304':>6}{'wasted':>8}{'docs/s':>9}{'MB/s':>8}")
+    for r in reports:
+        print(f"{r['phase']:<28}{r['wall_time_s']:>9}{r['requests']:>7}{r['docs']:>7}{r['not_modified']:>6}"
+              f"{r['wasted_requests']:>8}{r['docs_per_s']:>9}{r['mb_per_s']:>8}")
+    print(f"Total wall time: {total:.2f}s")
+    for name, histogram in client_metrics["histograms"].items():
+        for labels, values in histogram.items():
+            print(f"{name} ({labels}): count={values['count']} mean={values['mean']}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "total_wall_time_s": round(total, 3), "phases": reports,
+                       "client_metrics": client_metrics}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules de app/ s'importent comme dans main.py (adapters.*, core.*)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
@@ -0,0 +1,89 @@
+import asyncio
+import pandas as pd
+import pytest
+from adapters import job_scheduler
+from adapters.failure_registry import FailureRegistry
+from adapters.rate_limiter import AdaptiveRateLimiter
+from adapters.job_scheduler import JobScheduler, PRIORITY_AUTHORISED, PRIORITY_UPDATE, PRIORITY_WITHDRAWN
+
+
+def simplified(names: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({"Name": names, "Revision_nb": [1] * len(names)})
+
+
+# download_pdf remplacé : enregistre les appels et note un échec pour les médicaments de "failing"
+# (jusqu'à ce que leur nombre de tentatives atteigne "fail_until")
+@pytest.fixture
+def downloads(monkeypatch):
+    calls: list[str] = []
+    failing: dict[str, int] = {}
+
+    async def fake_download_pdf(language, row, index, total_count, dl_path, session, limiter, registry, status,
+                                *args):
+        calls.append(row.Name)
+        if calls.count(row.Name) <= failing.get(row.Name, 0):
+            registry.record_failure(row.Name, status, f"https://example.org/{row.Name}")
+        else:
+            registry.resolve_failure(row.Name, status)
+
+    monkeypatch.setattr(job_scheduler, "download_pdf", fake_download_pdf)
+    return calls, failing
+
+
+def make_scheduler(tmp_path, **kwargs) -> JobScheduler:
+    registries = {"en": FailureRegistry(str(tmp_path / "failure_registry.db"), import_legacy=False)}
+    limiter = AdaptiveRateLimiter(initial_concurrency=1, max_concurrency=1)
+    return JobScheduler(None, limiter, registries, **kwargs)  # type: ignore[arg-type]
+
+
+def run(scheduler: JobScheduler) -> None:
+    # Un scheduler qui ne se termine pas fait échouer le test au lieu de le bloquer
+    asyncio.run(asyncio.wait_for(scheduler.run(), timeout=10))
+
+
+def test_priority_order(tmp_path, downloads):
+    calls, _ = downloads
+    scheduler = make_scheduler(tmp_path)
+    scheduler.add_downloads(simplified(["W1", "W2"]), "ema_withdrawn_rcp", "Withdrawn", "en", PRIORITY_WITHDRAWN)
+    scheduler.add_downloads(simplified(["A1", "A2"]), "ema_authorised_rcp", "Authorised", "en", PRIORITY_AUTHORISED)
+    scheduler.add_downloads(simplified(["A2"]), "ema_authorised_rcp", "Authorised", "en", PRIORITY_UPDATE)
+    scheduler.add_downloads(simplified(["U1"]), "ema_authorised_rcp", "Authorised", "en", PRIORITY_UPDATE)
+    run(scheduler)
+    # A2 est déjà en file : il n'est pas ajouté une seconde fois avec la priorité des mises à jour
+    assert calls == ["U1", "A1", "A2", "W1", "W2"]
+
+
+def test_requeue_until_success(tmp_path, downloads):
+    calls, failing = downloads
+    failing["A1"] = 1
+    scheduler = make_scheduler(tmp_path, max_attempts=3, retry_backoff=0.05)
+    scheduler.add_downloads(simplified(["A1", "A2"]), "ema_authorised_rcp", "Authorised", "en", PRIORITY_AUTHORISED)
+    run(scheduler)
+    # A2 n'attend pas la relance de A1
+    assert calls == ["A1", "A2", "A1"]
+    assert not scheduler.registries["en"].is_failed("A1", "Authorised")
+
+
+def test_requeue_stops_at_max_attempts(tmp_path, downloads):
+    calls, failing = downloads
+    failing["A1"] = 10
+    after_calls: list[str] = []
+    scheduler = make_scheduler(tmp_path, max_attempts=3, retry_backoff=0.05)
+    scheduler.add_downloads(simplified(["A1"]), "ema_authorised_rcp", "Authorised", "en", PRIORITY_AUTHORISED,
+                            after=after_calls.append)
+    run(scheduler)
+    # run() attend les relances en attente puis se termine une fois max_attempts atteint
+    assert calls == ["A1"] * 3
+    assert scheduler.registries["en"].is_failed("A1", "Authorised")
+    assert after_calls == ["A1"]
+
+
+def test_after_hook_runs_once(tmp_path, downloads):
+    _, failing = downloads
+    failing["A1"] = 2
+    after_calls: list[str] = []
+    scheduler = make_scheduler(tmp_path, max_attempts=3, retry_backoff=0.05)
+    scheduler.add_downloads(simplified(["A1", "A2"]), "ema_authorised_rcp", "Authorised", "en", PRIORITY_AUTHORISED,
+                            after=after_calls.append)
+    run(scheduler)
+    assert sorted(after_calls) == ["A1", "A2"]
@@ -0,0 +1,67 @@
+import random
+import pandas as pd
+import pytest
+from core.manipulate_df import (clean_name_authorised, clean_name_withdrawn, clean_names_authorised,
+                                clean_names_withdrawn, normalize_names)
+
+# Fragments qui exercent chaque étape de la normalisation (apostrophes, parenthèses "in" / "previously",
+# ponctuation, petits mots, espaces multiples, caractères dont la capitalisation diffère selon les moteurs)
+FRAGMENTS = list("abcdefghij ABC()/.,;:'’-\t") + [
+    " of ", " the ", " a ", " and ", "(in x)", "(previously Foo Bar)", "(Previously baz)", " in ", "ß", "ǆ",
+    " for", " ", "1 ",
+]
+KNOWN_NAMES = [
+    "Budesonide/Formoterol Teva Pharma B.V.",
+    "Pandemic influenza vaccine H5N1 Baxter AG",
+    "Arikayce liposomal",
+    "Abc (previously Xyz Q)",
+    "Lamivudine/Zidovudine Teva",
+    "a of the",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def names() -> pd.Series:
+    rng = random.Random(1)
+    fuzzed = ["".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 25))) for _ in range(5000)]
+    return pd.Series(fuzzed + KNOWN_NAMES)
+
+
+# Référence : clean_name_withdrawn appliqué ligne par ligne, comme avant la vectorisation
+def withdrawn_reference(names: pd.Series, authorised_names_clean: set | None) -> pd.Series:
+    def clean(name: str) -> str:
+        name_clean = clean_name_authorised(name)
+        in_authorised = authorised_names_clean and name_clean in authorised_names_clean
+        return clean_name_withdrawn(name, name_clean if in_authorised else "")
+    return names.map(clean)
+
+
+def test_clean_names_authorised_matches_scalar(names):
+    assert clean_names_authorised(names).tolist() == names.map(clean_name_authorised).tolist()
+
+
+@pytest.mark.parametrize("sample_size", [0, 1000])
+def test_clean_names_withdrawn_matches_scalar(names, sample_size):
+    reference_authorised = names.map(clean_name_authorised)
+    authorised_names_clean = set(random.Random(2).sample(list(reference_authorised), sample_size))
+    expected = withdrawn_reference(names, authorised_names_clean)
+    result = clean_names_withdrawn(names, clean_names_authorised(names), authorised_names_clean)
+    assert result.tolist() == expected.tolist()
+
+
+def test_clean_names_withdrawn_collisions():
+    names = pd.Series(["Abc (previously Xyz Q)", "Abc", "Def"])
+    names_clean = clean_names_authorised(names)
+    result = clean_names_withdrawn(names, names_clean, {"Abc"})
+    # Nom identique à un authorised : suffixe tiré de "(previously ...)", sinon "-0"
+    assert result.tolist() == ["Abc-xyz-q", "Abc-0", "Def"]
+    assert result.tolist() == withdrawn_reference(names, {"Abc"}).tolist()
+
+
+def test_normalize_names_cache(names, tmp_path):
+    cache_path = str(tmp_path / "name_cache.json")
+    expected = names.map(clean_name_authorised).tolist()
+    assert normalize_names(names, cache_path).tolist() == expected
+    # Second appel : tous les noms viennent du cache
+    assert normalize_names(names, cache_path).tolist() == expected
@@ -0,0 +1,77 @@
+from core.plan import compute_plan
+
+AUTHORISED = "ema_authorised_rcp"
+WITHDRAWN = "ema_withdrawn_rcp"
+
+
+def plan_for(authorised_names, withdrawn_names, authorised_files, withdrawn_files, store=False, not_found=(),
+             slug_tried=(), **kwargs):
+    files = {AUTHORISED: (set(authorised_files), set()), WITHDRAWN: (set(withdrawn_files), set())}
+    return compute_plan(["en"], authorised_names, withdrawn_names, files, {"en": set(not_found)}, set(slug_tried),
+                        store, **kwargs)
+
+
+def test_known_404_skipped_only_once_slug_was_tried():
+    plan = plan_for(["A", "B", "C"], [], [], [], not_found={"A", "B"}, slug_tried={"A", "C"})
+    assert plan.skipped_not_found == {AUTHORISED: ["A"]}
+    # B : 404 connu mais slug jamais recherché ; C : slug recherché sans 404 enregistré
+    assert plan.downloads == {AUTHORISED: ["B", "C"]}
+
+
+def test_resumes():
+    files = {AUTHORISED: (set(), {"A", "B"}), WITHDRAWN: (set(), set())}
+    plan = compute_plan(["en"], ["A", "B"], [], files, {"en": set()}, set(), store=True,
+                        resumable={f"{AUTHORISED}/A.pdf"})
+    assert plan.downloads == {AUTHORISED: ["A", "B"]}
+    assert plan.resumes == {AUTHORISED: ["A"]}
+
+
+def test_withdrawn_copy_renamed_in_store_mode():
+    plan = plan_for([], ["W"], ["W"], [], store=True)
+    assert plan.renames == [(f"{AUTHORISED}/W.pdf", f"{WITHDRAWN}/W.pdf")]
+    assert plan.downloads == {}
+    assert plan.deletions == []
+
+
+def test_withdrawn_copy_downloaded_without_store():
+    plan = plan_for([], ["W"], ["W"], [], store=False)
+    assert plan.renames == []
+    assert plan.downloads == {WITHDRAWN: ["W"]}
+    assert plan.deletions == [f"{AUTHORISED}/W.pdf"]
+
+
+def test_deletions():
+    plan = plan_for(["A"], ["W", "X"], ["A", "A_old", "W", "X"], ["W"], store=False, not_found={"X"},
+                    slug_tried={"X"})
+    # A : mise à jour laissée en _old ; W : copie authorised d'un withdrawn déjà téléchargé ; X : 404 connu,
+    # la copie authorised est conservée tant que la version withdrawn n'est pas téléchargée
+    assert plan.updates == {AUTHORISED: ["A"]}
+    assert plan.deletions == [f"{AUTHORISED}/A_old.pdf", f"{AUTHORISED}/W.pdf"]
+    assert plan.skipped_not_found == {WITHDRAWN: ["X"]}
+
+
+def test_old_version_ignored_in_store_mode():
+    # Blob store : l'ancienne version reste dans l'historique, pas de fichier _old à remplacer
+    plan = plan_for(["A"], [], ["A", "A_old"], [], store=True)
+    assert plan.updates == {}
+    assert plan.deletions == []
+
+
+def test_revalidation_exclusions():
+    manifest_paths = {f"{AUTHORISED}/{name}.pdf" for name in ("A", "B", "D")} | {f"{WITHDRAWN}/W.pdf"}
+    plan = plan_for(["A", "B", "C", "D", "E"], ["W"], ["A", "B", "B_old", "C"], ["W"], store=False,
+                    manifest_paths=manifest_paths, revalidate_days=1)
+    # B : mise à jour prévue ; C : présent mais inconnu du manifest ; D : connu du manifest mais absent (téléchargé)
+    assert plan.revalidations == {AUTHORISED: ["A"], WITHDRAWN: ["W"]}
+    assert plan.updates == {AUTHORISED: ["B"]}
+    assert plan.downloads == {AUTHORISED: ["D", "E"]}
+
+
+def test_revalidation_rotation():
+    names = [f"M{i:03d}" for i in range(100)]
+    manifest_paths = {f"{AUTHORISED}/{name}.pdf" for name in names}
+    days = [plan_for(names, [], names, [], manifest_paths=manifest_paths, revalidate_days=7, day=day)
+            for day in range(7)]
+    # Chaque fichier est revérifié exactement une fois par rotation de 7 jours
+    revalidated = [name for plan in days for name in plan.revalidations.get(AUTHORISED, [])]
+    assert sorted(revalidated) == names
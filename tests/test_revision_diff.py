@@ -0,0 +1,37 @@
+import pandas as pd
+from core.revision_diff import ChangeSet, compute_change_set
+
+
+def simplified(rows: list[tuple[str, int]]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["Name", "Revision_nb"])
+
+
+def test_compute_change_set():
+    today = simplified([("A", 1), ("B", 3), ("D", 1)])
+    yesterday = simplified([("A", 1), ("B", 2), ("C", 5), ("E", 1)])
+    withdrawn_today = simplified([("C", 6)])
+    changes = compute_change_set(today, yesterday, withdrawn_today)
+    assert changes == ChangeSet(
+        added=frozenset({"D"}),
+        removed=frozenset({"E"}),
+        revision_bumped=frozenset({"B"}),
+        moved_to_withdrawn=frozenset({"C"}))
+
+
+def test_compute_change_set_duplicate_names():
+    # Un nom en double correspond à un seul fichier : seule la dernière ligne compte
+    today = simplified([("A", 1), ("A", 2), ("B", 4), ("B", 4)])
+    yesterday = simplified([("A", 2), ("A", 2), ("B", 3), ("B", 4)])
+    changes = compute_change_set(today, yesterday)
+    assert changes.revision_bumped == frozenset()
+    assert changes.added == frozenset()
+    assert changes.removed == frozenset()
+
+    changes = compute_change_set(simplified([("A", 1), ("A", 3)]), simplified([("A", 1), ("A", 2)]))
+    assert changes.revision_bumped == frozenset({"A"})
+
+
+def test_compute_change_set_without_withdrawn_list():
+    changes = compute_change_set(simplified([("A", 1)]), simplified([("A", 1), ("B", 1)]))
+    assert changes.removed == frozenset({"B"})
+    assert changes.moved_to_withdrawn == frozenset()
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from adapters.shard_coordinator import LeaseTable, shard_names
+
+
+def test_owners_never_share_a_shard(tmp_path):
+    leases = LeaseTable(str(tmp_path / "crawl_leases.db"), lease_ttl=60)
+    leases.init_shards(4)
+    shards = [leases.acquire(f"w{i}") for i in range(4)]
+    assert sorted(shards) == [0, 1, 2, 3]
+    # Toutes les parts sont tenues par un bail en cours : rien pour un cinquième worker
+    assert leases.acquire("w4") is None
+    # Un worker qui redemande du travail retrouve sa propre part
+    assert leases.acquire("w2") == shards[2]
+    leases.close()
+
+
+def test_concurrent_workers_never_share_a_shard(tmp_path):
+    db_path = str(tmp_path / "crawl_leases.db")
+    LeaseTable(db_path).init_shards(32)
+
+    # Chaque worker (sa propre connexion) prend et termine des parts jusqu'à ce qu'il n'en reste plus
+    def worker(owner: str) -> list[int]:
+        leases = LeaseTable(db_path, lease_ttl=60)
+        done = []
+        while (shard := leases.acquire(owner)) is not None:
+            done.append(shard)
+            leases.complete(owner, shard)
+        leases.close()
+        return done
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(worker, [f"w{i}" for i in range(6)]))
+    assert sorted(shard for done in results for shard in done) == list(range(32))
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    leases = LeaseTable(str(tmp_path / "crawl_leases.db"), lease_ttl=0.05)
+    leases.init_shards(1)
+    assert leases.acquire("w0") == 0
+    assert leases.acquire("w1") is None
+    time.sleep(0.1)
+    assert leases.acquire("w1") == 0
+    leases.close()
+
+
+def test_lost_lease_cannot_be_renewed(tmp_path):
+    leases = LeaseTable(str(tmp_path / "crawl_leases.db"), lease_ttl=0.05)
+    leases.init_shards(1)
+    assert leases.acquire("w0") == 0
+    assert leases.renew("w0", 0)
+    time.sleep(0.1)
+    assert leases.acquire("w1") == 0
+    assert not leases.renew("w0", 0)
+    assert leases.renew("w1", 0)
+    leases.close()
+
+
+def test_complete(tmp_path):
+    leases = LeaseTable(str(tmp_path / "crawl_leases.db"), lease_ttl=60)
+    leases.init_shards(2)
+    shard = leases.acquire("w0")
+    assert shard is not None
+    # Seul le titulaire du bail termine la part
+    leases.complete("w1", shard)
+    assert leases.pending() == 2
+    leases.complete("w0", shard)
+    assert leases.pending() == 1
+    assert not leases.renew("w0", shard)
+    assert leases.acquire("w0") == 1 - shard
+    leases.complete("w0", 1 - shard)
+    assert leases.pending() == 0
+    assert leases.acquire("w0") is None
+    leases.close()
+
+
+def test_shard_names_partition():
+    names = [f"Medicine-{i:05d}" for i in range(200)]
+    parts = [shard_names(names, shard, 8) for shard in range(8)]
+    assert set().union(*parts) == set(names)
+    assert sum(len(part) for part in parts) == len(names)
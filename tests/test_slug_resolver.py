@@ -0,0 +1,75 @@
+import asyncio
+import json
+import pytest
+from adapters.download_file import SPECIAL_CASES_AUTHORISED, SPECIAL_CASES_WITHDRAWN
+from adapters.rate_limiter import AdaptiveRateLimiter
+from adapters.slug_resolver import SlugResolver, candidate_slugs, default_slug
+
+
+# Session HTTP minimale pour les requêtes HEAD de SlugResolver.resolve : 200 pour les URL de "found", 404 sinon
+class FakeSession:
+
+    class Response:
+
+        def __init__(self, status: int):
+            self.status = status
+            self.headers: dict[str, str] = {}
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return None
+
+    def __init__(self, found: set[str]):
+        self.found = found
+        self.requested: list[str] = []
+
+    def head(self, url: str, allow_redirects: bool = True) -> "FakeSession.Response":
+        self.requested.append(url)
+        return self.Response(200 if url in self.found else 404)
+
+
+def resolve(resolver: SlugResolver, drug_name: str, session: FakeSession) -> str | None:
+    limiter = AdaptiveRateLimiter(initial_concurrency=1, rate=1000, burst=1000)
+    return asyncio.run(resolver.resolve(drug_name, lambda slug: slug, session, limiter))  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("drug_name, slug", [*SPECIAL_CASES_AUTHORISED.items(), *SPECIAL_CASES_WITHDRAWN.items()])
+def test_candidate_slugs_cover_special_cases(drug_name, slug):
+    candidates = candidate_slugs(drug_name)
+    assert slug in candidates
+    assert default_slug(drug_name) not in candidates
+    assert len(candidates) == len(set(candidates))
+
+
+def test_resolve_and_save_round_trip(tmp_path):
+    cache_path = str(tmp_path / "slug_cache.json")
+    resolver = SlugResolver(cache_path)
+    session = FakeSession({"lamivudinezidovudine-teva-epar-product-information"})
+    assert resolve(resolver, "Lamivudine-zidovudine-teva", session) == \
+        "lamivudinezidovudine-teva-epar-product-information"
+    assert resolve(resolver, "Unknown-medicine", session) is None
+    assert resolver.was_tried("Lamivudine-zidovudine-teva")
+    assert resolver.was_tried("Unknown-medicine")
+    assert not resolver.was_tried("Other-medicine")
+    resolver.save()
+
+    reloaded = SlugResolver(cache_path)
+    assert reloaded.slug("Lamivudine-zidovudine-teva") == "lamivudinezidovudine-teva-epar-product-information"
+    assert reloaded.slug("Unknown-medicine") == default_slug("Unknown-medicine")
+    assert reloaded.was_tried("Lamivudine-zidovudine-teva")
+    assert reloaded.was_tried("Unknown-medicine")
+    assert not reloaded.was_tried("Other-medicine")
+
+
+def test_seeds_are_not_saved_until_something_changes(tmp_path):
+    cache_path = tmp_path / "slug_cache.json"
+    resolver = SlugResolver(str(cache_path), seeds=SPECIAL_CASES_AUTHORISED)
+    assert resolver.slug("Arikayce-liposomal") == "arikayce-liposomal-product-information"
+    resolver.save()
+    assert not cache_path.exists()
+
+    resolve(resolver, "Unknown-medicine", FakeSession(set()))
+    resolver.save()
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["tried"] == ["Unknown-medicine"]
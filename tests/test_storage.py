@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import aiohttp
+import boto3
+import pytest
+from moto import mock_aws
+from adapters.storage import S3Storage
+
+BUCKET = "ema-rcp-test"
+
+
+# Réponse HTTP minimale (corps découpé en blocs, Content-Length) pour S3Storage.write_stream
+class FakeResponse:
+
+    class Content:
+
+        def __init__(self, body: bytes):
+            self.body = body
+
+        async def iter_chunked(self, size: int):
+            for start in range(0, len(self.body), size):
+                yield self.body[start:start + size]
+
+    def __init__(self, body: bytes, content_length: int | None = None):
+        self.content = self.Content(body)
+        self.content_length = len(body) if content_length is None else content_length
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_write_stream_multipart(s3_client):
+    storage = S3Storage(BUCKET, "rcp", client=s3_client, part_size=5 * 1024 * 1024, max_concurrency=2)
+    body = bytes(range(256)) * (12 * 1024 * 1024 // 256 + 7)
+    size, sha256 = asyncio.run(storage.write_stream(FakeResponse(body), "ema_authorised_rcp/A.pdf"))
+
+    assert (size, sha256) == (len(body), hashlib.sha256(body).hexdigest())
+    obj = s3_client.get_object(Bucket=BUCKET, Key="rcp/ema_authorised_rcp/A.pdf")
+    assert obj["Body"].read() == body
+    # 12 Mio en parties de 5 Mio : ETag multipart "<md5>-3"
+    assert obj["ETag"].strip('"').endswith("-3")
+
+
+def test_write_stream_single_put(s3_client):
+    storage = S3Storage(BUCKET, client=s3_client)
+    body = b"%PDF-1.4 small %%EOF"
+    assert asyncio.run(storage.write_stream(FakeResponse(body), "ema_withdrawn_rcp/B.pdf")) == (
+        len(body), hashlib.sha256(body).hexdigest())
+    assert s3_client.get_object(Bucket=BUCKET, Key="ema_withdrawn_rcp/B.pdf")["Body"].read() == body
+
+
+def test_write_stream_incomplete_body_aborts_upload(s3_client):
+    storage = S3Storage(BUCKET, client=s3_client, part_size=5 * 1024 * 1024)
+    body = b"x" * (6 * 1024 * 1024)
+    with pytest.raises(aiohttp.ClientPayloadError):
+        asyncio.run(storage.write_stream(FakeResponse(body, len(body) + 1), "ema_authorised_rcp/C.pdf"))
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=BUCKET)
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=BUCKET)
+
+
+def test_scan(s3_client):
+    storage = S3Storage(BUCKET, "rcp", client=s3_client)
+    # Plus de 1000 clés : plusieurs pages de list_objects_v2
+    for i in range(1005):
+        s3_client.put_object(Bucket=BUCKET, Key=f"rcp/ema_authorised_rcp/M{i:04d}.pdf", Body=b"%PDF-")
+    s3_client.put_object(Bucket=BUCKET, Key="rcp/ema_authorised_rcp/sub/X.pdf", Body=b"%PDF-")
+    s3_client.put_object(Bucket=BUCKET, Key="rcp/ema_authorised_rcp_fr/M0000.pdf", Body=b"%PDF-")
+
+    files = storage.scan("ema_authorised_rcp")
+    assert len(files) == 1005
+    assert files["M0000.pdf"][0] == 5
+    assert "sub/X.pdf" not in files
+    assert storage.scan("missing") == {}